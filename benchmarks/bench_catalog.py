@@ -0,0 +1,49 @@
+# Data-loading cost of one "View All Courses" rerun: parsing courses.csv every
+# time (old page) vs reading the shared catalog.
+# Run from the repo root:  python -m benchmarks.bench_catalog [reruns]
+import sys
+import time
+import pandas as pd
+from logics import course_catalog
+
+
+def old_rerun(path):
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip()
+    df.rename(columns={"Course Title": "title", "Course Provider": "provider",
+                       "Training Mode": "mode", " Cost ": "cost"}, inplace=True)
+    sorted(df["Competency"].dropna().unique().tolist())
+    sorted(df["Proficiency Level"].dropna().unique().tolist())
+    return df
+
+
+def new_rerun(path):
+    catalog = course_catalog.get_catalog(path)
+    catalog.competencies
+    catalog.proficiency_levels
+    return catalog.df
+
+
+def timeit(fn, path, reruns):
+    start = time.perf_counter()
+    for _ in range(reruns):
+        fn(path)
+    return (time.perf_counter() - start) / reruns * 1000
+
+
+def main(reruns=200):
+    path = course_catalog.CSV_PATH
+    start = time.perf_counter()
+    course_catalog.get_catalog(path)
+    first_load = (time.perf_counter() - start) * 1000
+
+    old = timeit(old_rerun, path, reruns)
+    new = timeit(new_rerun, path, reruns)
+    print(f"first catalog load:       {first_load:8.3f} ms")
+    print(f"rerun, parse CSV (old):   {old:8.3f} ms")
+    print(f"rerun, shared catalog:    {new:8.3f} ms  ({old / new:.0f}x faster)")
+    print(f"catalog loads this run:   {course_catalog.load_count}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
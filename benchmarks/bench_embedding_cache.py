@@ -0,0 +1,41 @@
+# Cold vs warm timings for embedding every row of courses.csv.
+# Run from the repo root:  python -m benchmarks.bench_embedding_cache
+import os
+import time
+import tempfile
+from helper_functions import llm
+from helper_functions.embedding_store import EmbeddingStore
+from logics.course_catalog import get_catalog
+from logics.course_index import row_to_text
+
+
+def main():
+    texts = [row_to_text(row) for row in get_catalog().records]
+    print(f"{len(texts)} rows, {len(set(texts))} unique texts, "
+          f"{sum(llm.count_tokens(t) for t in texts)} tokens")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EmbeddingStore(os.path.join(tmp, 'embeddings.sqlite'))
+
+        start = time.perf_counter()
+        llm.get_embeddings_cached(texts, store=store)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        llm.get_embeddings_cached(texts, store=store)
+        warm = time.perf_counter() - start
+
+        # Baseline: the original one-request-per-call pattern, no cache
+        start = time.perf_counter()
+        for text in texts[:50]:
+            llm.get_embedding(text)
+        uncached_per_row = (time.perf_counter() - start) / 50
+        store.close()
+
+    print(f"cold (batched, concurrent): {cold:8.3f}s")
+    print(f"warm (all cache hits):      {warm:8.3f}s")
+    print(f"one call per row (est.):    {uncached_per_row * len(texts):8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# p50/p95 turn latency: sequential stages vs the concurrent pipeline.
+# Run from the repo root:  python -m benchmarks.bench_pipeline [rounds]
+import sys
+import asyncio
+import statistics
+from helper_functions import llm
+from helper_functions import moderation
+from logics import customer_query_handler as handler
+
+QUERIES = [
+    "What courses are there for internal audit?",
+    "I am new to budgeting, where should I start?",
+    "Any advanced courses on data analytics and visualisation?",
+    "Which courses cover sustainability reporting?",
+    "What tax compliance courses are available and how much do they cost?",
+]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarise(name, totals):
+    print(f"{name:<12} n={len(totals):<3} p50={percentile(totals, 50):6.2f}s "
+          f"p95={percentile(totals, 95):6.2f}s mean={statistics.mean(totals):6.2f}s")
+
+
+def main(rounds=3):
+    # Measure the network path, not the caches
+    llm.USE_COMPLETION_CACHE = False
+    handler.SEMANTIC_CACHE = False
+    moderation.USE_CACHE = False
+    history = [{"role": "system", "content": "You are a helpful assistant for course recommendations."}]
+
+    sequential, pipelined = [], []
+    for _ in range(rounds):
+        for query in QUERIES:
+            _, _, timings = handler.process_user_message_sequential(history, query)
+            sequential.append(timings['total'])
+            _, _, timings = asyncio.run(handler.process_user_message_async(history, query))
+            pipelined.append(timings['total'])
+
+    summarise("sequential", sequential)
+    summarise("pipeline", pipelined)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,74 @@
+# Reply generation: "steps" (reasoning + answer after the last ####) vs
+# "answer" (answer only, compact de-duplicated course context).
+# Courses are identified once per query, then both modes generate from the
+# same details. Reports prompt and output tokens, time to first visible token
+# and wall time of the generation stage.
+# Run from the repo root:  python -m benchmarks.bench_response_mode [rounds]
+import sys
+import asyncio
+import statistics
+from helper_functions import llm
+from helper_functions import moderation
+from helper_functions import openai_client
+from logics import customer_query_handler as handler
+from benchmarks.bench_pipeline import QUERIES, percentile
+
+MODES = ("steps", "answer")
+
+
+def prompt_messages(mode, history, query, details):
+    if mode == "answer":
+        return handler.build_answer_messages(history, query, details)
+    return handler.build_response_messages(history, query, details)
+
+
+async def generate(mode, history, query, details):
+    """(timings, full model output) for one generation."""
+    timings = {}
+    output = []
+    original = llm.stream_completion_by_messages_async
+
+    # Capture everything the model produced, including the hidden reasoning steps
+    async def recording(*args, **kwargs):
+        async for delta in original(*args, **kwargs):
+            output.append(delta)
+            yield delta
+
+    llm.stream_completion_by_messages_async = recording
+    try:
+        async with openai_client.async_client_session():
+            await handler.generate_and_moderate_async(history, query, details, timings, mode=mode)
+    finally:
+        llm.stream_completion_by_messages_async = original
+    return timings, ''.join(output)
+
+
+def main(rounds=2):
+    llm.USE_COMPLETION_CACHE = False
+    moderation.USE_CACHE = False  # every round moderates the same replies again
+    history = [{"role": "system", "content": "You are a helpful assistant for course recommendations."}]
+    details_by_query = {
+        q: handler.get_course_details(handler.identify_competency_and_courses(q)) for q in QUERIES
+    }
+
+    results = {mode: {"prompt": [], "output": [], "first": [], "wall": []} for mode in MODES}
+    for _ in range(rounds):
+        for query, details in details_by_query.items():
+            for mode in MODES:
+                timings, output = asyncio.run(generate(mode, history, query, details))
+                r = results[mode]
+                r["prompt"].append(llm.count_tokens_from_message(prompt_messages(mode, history, query, details)))
+                r["output"].append(llm.count_tokens(output))
+                r["first"].append(timings.get("first_visible_token", timings["generation"]))
+                r["wall"].append(timings["generation"])
+
+    for mode in MODES:
+        r = results[mode]
+        print(f"{mode:<7} prompt tokens {statistics.mean(r['prompt']):7.0f}  "
+              f"output tokens {statistics.mean(r['output']):6.0f}  "
+              f"first visible p50 {percentile(r['first'], 50):5.2f}s  "
+              f"generation p50 {percentile(r['wall'], 50):5.2f}s  p95 {percentile(r['wall'], 95):5.2f}s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2)
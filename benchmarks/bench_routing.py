@@ -0,0 +1,90 @@
+# Course identification: today's single-shot prompt (whole catalog dict) vs
+# two-stage routing (competency codes, then course IDs).
+# Reports prompt tokens, latency and match accuracy on a small labelled query set:
+#   competency hit - at least one returned course is in an expected competency
+#   resolved       - share of returned course names that exist in the catalog
+#                    (echo drift in the single-shot prompt shows up here)
+# Run from the repo root:  python -m benchmarks.bench_routing [rounds]
+import sys
+import time
+import statistics
+from helper_functions import llm
+from logics import course_catalog
+from logics import course_routing
+from logics import customer_query_handler as handler
+from benchmarks.bench_pipeline import percentile
+
+# query -> competency codes that count as a correct route
+LABELLED_QUERIES = [
+    ("What courses are there for internal audit?", {"C01"}),
+    ("I need to learn about enterprise risk management and governance", {"C02"}),
+    ("Any courses on GST and income tax compliance?", {"C03"}),
+    ("How do I prepare financial statements under SB-FRS?", {"C04"}),
+    ("I am new to budgeting, where should I start?", {"C06"}),
+    ("Courses on value for money and procurement savings", {"C07"}),
+    ("Any advanced courses on data analytics and visualisation?", {"C09"}),
+    ("Which courses teach Power BI or Tableau dashboards?", {"C09", "C10"}),
+    ("I want to partner better with business units as a finance officer", {"C12"}),
+    ("Which courses cover sustainability reporting?", {"C14"}),
+    ("How can I communicate and present more confidently?", {"PS"}),
+]
+
+
+def prompt_tokens_full(query):
+    return llm.count_tokens_from_message(handler.full_prompt_messages(query))
+
+
+def prompt_tokens_routed(query, table, codes):
+    tokens = llm.count_tokens(course_routing.route_competencies_prompt(query, table))
+    if codes:
+        tokens += llm.count_tokens(course_routing.choose_courses_prompt(query, table, codes))
+    return tokens
+
+
+def score(matches, expected, catalog):
+    names = [m.get('course_name') for m in matches]
+    resolved = sum(1 for n in names if n in catalog.by_title)
+    codes = {course_routing.competency_code(catalog.by_title[n]['Competency']) for n in names if n in catalog.by_title}
+    return bool(codes & expected), (resolved / len(names) if names else 1.0)
+
+
+def run_mode(name, identify, rounds, catalog):
+    """`identify(query)` returns (matches, prompt tokens sent)."""
+    latencies, tokens, hits, resolved = [], [], [], []
+    for _ in range(rounds):
+        for query, expected in LABELLED_QUERIES:
+            start = time.perf_counter()
+            matches, prompt_tokens = identify(query)
+            latencies.append(time.perf_counter() - start)
+            tokens.append(prompt_tokens)
+            hit, share = score(matches, expected, catalog)
+            hits.append(hit)
+            resolved.append(share)
+    print(f"{name:<12} prompt tokens/query {statistics.mean(tokens):8.0f}  "
+          f"p50 {percentile(latencies, 50):5.2f}s  p95 {percentile(latencies, 95):5.2f}s  "
+          f"competency hit {sum(hits) / len(hits):6.1%}  resolved {statistics.mean(resolved):6.1%}")
+
+
+def main(rounds=1):
+    llm.USE_COMPLETION_CACHE = False
+    catalog = course_catalog.get_catalog()
+    table = course_routing.get_routing_table(catalog)
+
+    def single_shot(query):
+        try:
+            matches = handler.identify_competency_and_courses_full_prompt(query)
+        except ValueError:
+            matches = []  # the reply was not valid JSON
+        return matches, prompt_tokens_full(query)
+
+    def routed(query):
+        report = {}
+        matches = course_routing.identify_courses_routed(query, table, report=report)
+        return matches, prompt_tokens_routed(query, table, report['codes'])
+
+    run_mode("single-shot", single_shot, rounds, catalog)
+    run_mode("routed", routed, rounds, catalog)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
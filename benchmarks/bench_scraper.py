@@ -0,0 +1,50 @@
+# Sequential vs pooled Playwright scraping, and full vs link-check fetch
+# profiles, against the local fixture site.
+# Run from the repo root:  python -m benchmarks.bench_scraper [n_urls] [delay_ms]
+import sys
+import time
+import asyncio
+from helper_functions.scraper import scrape_url_data
+from benchmarks.fixture_site import start_fixture_site
+
+
+def main(n_urls=40, delay_ms=500):
+    # Two "hosts" so the per-host cap matters
+    sites = [start_fixture_site() for _ in range(2)]
+    urls = [f"{sites[i % 2][1]}/page/{i}?delay={delay_ms}" for i in range(n_urls)]
+
+    runs = [
+        ("sequential (1 page)", dict(concurrency=1, contexts=1)),
+        ("pool of 4 pages", dict(concurrency=4, contexts=2)),
+        ("pool of 8 pages", dict(concurrency=8, contexts=2)),
+        ("pool of 16 pages", dict(concurrency=16, contexts=4, per_host_limit=8)),
+    ]
+    baseline = None
+    for name, options in runs:
+        progress = []
+        start = time.perf_counter()
+        results = asyncio.run(scrape_url_data(urls, progress_callback=progress.append, **options))
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        in_order = all(r["URL"] == u for r, u in zip(results, urls))
+        print(f"{name:<22} {elapsed:7.2f}s  speedup {baseline / elapsed:5.1f}x  "
+              f"in order: {in_order}  progress calls: {len(progress)}")
+
+    # Fetch profiles at a fixed pool size
+    for profile in ("full", "link-check"):
+        start = time.perf_counter()
+        results = asyncio.run(scrape_url_data(urls, concurrency=8, contexts=2, profile=profile))
+        elapsed = time.perf_counter() - start
+        ok = [r for r in results if r["load_ms"] is not None]
+        mean_load = sum(r["load_ms"] for r in ok) / max(1, len(ok))
+        mean_kb = sum(r["bytes_transferred"] for r in results) / max(1, len(results)) / 1024
+        print(f"profile {profile:<12} {elapsed:7.2f}s  mean load {mean_load:7.1f} ms  "
+              f"mean transferred {mean_kb:7.1f} KB/page")
+
+    for server, _ in sites:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,37 @@
+# Throughput of the multi-process browser scraper as the worker count grows,
+# against the local fixture site.
+# Run from the repo root:  python -m benchmarks.bench_sharded_scraper [n_urls] [delay_ms] [max_workers]
+import os
+import sys
+import time
+from helper_functions.sharded_scraper import scrape_urls_sharded
+from benchmarks.fixture_site import start_fixture_site
+
+
+def main(n_urls=120, delay_ms=300, max_workers=None):
+    max_workers = max_workers or min(8, os.cpu_count() or 1)
+    sites = [start_fixture_site() for _ in range(4)]
+    urls = [f"{sites[i % 4][1]}/page/{i}?delay={delay_ms}" for i in range(n_urls)]
+
+    baseline = None
+    workers = 1
+    while workers <= max_workers:
+        start = time.perf_counter()
+        results = scrape_urls_sharded(urls, workers=workers, concurrency=4, contexts=1, per_host_limit=4)
+        elapsed = time.perf_counter() - start
+        throughput = len(urls) / elapsed
+        baseline = baseline or throughput
+        in_order = all(r["URL"] == u for r, u in zip(results, urls))
+        per_worker = {}
+        for r in results:
+            per_worker[r.get("worker")] = per_worker.get(r.get("worker"), 0) + 1
+        print(f"workers={workers:<2} {elapsed:7.2f}s  {throughput:6.1f} URLs/s  "
+              f"scaling {throughput / baseline:4.1f}x  in order: {in_order}  per worker: {per_worker}")
+        workers *= 2
+
+    for server, _ in sites:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:4]])
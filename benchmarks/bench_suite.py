@@ -0,0 +1,214 @@
+# End-to-end benchmark suite, fully offline.
+# Starts the OpenAI stub (benchmarks.stub_openai) and the scraper fixture site,
+# then measures:
+#   chat    - per-stage p50/p95/p99 of process_user_message, tokens per turn
+#   load    - turns per second with several turns in flight at once
+#   scraper - per-page p50/p95/p99 and pages per second (skipped without Playwright or its browser)
+# Results are written to benchmarks/results/<commit>.json so runs can be compared:
+#   python -m benchmarks.bench_suite run [turns] [--latency-ms N] [--tokens-per-second N] [--error-rate F]
+#   python -m benchmarks.bench_suite compare benchmarks/results/<a>.json benchmarks/results/<b>.json
+# Runs in a scratch directory (with a copy of data/courses.csv), so the real
+# embedding, completion and index caches are never filled with stub data.
+import os
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from benchmarks.stub_openai import start_stub_server
+from benchmarks.fixture_site import start_fixture_site
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+# Timing keys that are not durations
+NON_LATENCY_KEYS = {'output_moderation_segments', 'context_tokens', 'context_tokens_baseline', 'context_tokens_saved',
+                    'semantic_cache_similarity'}
+
+
+def latency_summary(values):
+    # Imported here: bench_pipeline imports the handler, which must not load before run() configures the stub
+    from benchmarks.bench_pipeline import percentile
+    return {
+        'n': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 1),
+        'p95_ms': round(percentile(values, 95) * 1000, 1),
+        'p99_ms': round(percentile(values, 99) * 1000, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _scratch_dir():
+    scratch = tempfile.mkdtemp(prefix='bench_suite_')
+    os.makedirs(os.path.join(scratch, 'data'))
+    shutil.copy(os.path.join(ROOT_DIR, 'data', 'courses.csv'), os.path.join(scratch, 'data', 'courses.csv'))
+    return scratch
+
+
+def bench_chat(handler, stub, turns, queries):
+    stages, tokens, context_tokens = {}, [], []
+    history = [{"role": "system", "content": "You are a helpful assistant for course recommendations."}]
+    for i in range(turns):
+        before = stub.stats.snapshot()
+        _, _, timings = asyncio.run(handler.process_user_message_async(history, queries[i % len(queries)]))
+        after = stub.stats.snapshot()
+        for stage, value in timings.items():
+            if stage not in NON_LATENCY_KEYS:
+                stages.setdefault(stage, []).append(value)
+        tokens.append((after['prompt_tokens'] - before['prompt_tokens'])
+                      + (after['completion_tokens'] - before['completion_tokens']))
+        context_tokens.append(timings.get('context_tokens', 0))
+    return {
+        'stages': {stage: latency_summary(values) for stage, values in sorted(stages.items())},
+        'tokens_per_turn': round(sum(tokens) / len(tokens), 1),
+        'context_tokens_per_turn': round(sum(context_tokens) / len(context_tokens), 1),
+    }
+
+
+def bench_load(handler, turns, in_flight, queries):
+    history = [{"role": "system", "content": "You are a helpful assistant for course recommendations."}]
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(in_flight)
+
+        async def one(i):
+            async with semaphore:
+                return await handler.process_user_message_async(history, queries[i % len(queries)])
+
+        return await asyncio.gather(*(one(i) for i in range(turns)))
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    elapsed = time.perf_counter() - start
+    return {
+        'in_flight': in_flight,
+        'turns': turns,
+        'turns_per_second': round(turns / elapsed, 2),
+        'total': latency_summary([timings['total'] for _, _, timings in results]),
+    }
+
+
+def bench_scraper(n_urls, delay_ms):
+    try:
+        from helper_functions.scraper import scrape_url_data
+    except ImportError as e:
+        return {'skipped': str(e)}
+    sites = [start_fixture_site() for _ in range(2)]
+    urls = [f"{sites[i % 2][1]}/page/{i}?delay={delay_ms}" for i in range(n_urls)]
+    start = time.perf_counter()
+    try:
+        results = asyncio.run(scrape_url_data(urls, profile='link-check'))
+    except Exception as e:
+        # e.g. Playwright is installed but its browser is not
+        return {'skipped': f"{type(e).__name__}: {e}".splitlines()[0]}
+    finally:
+        for server, _ in sites:
+            server.shutdown()
+    elapsed = time.perf_counter() - start
+    latencies = [r['latency_ms'] / 1000 for r in results if r.get('latency_ms') is not None]
+    if not latencies:
+        return {'skipped': 'no page reported a latency'}
+    return {
+        'pages': n_urls,
+        'pages_per_second': round(n_urls / elapsed, 2),
+        'page': latency_summary(latencies),
+    }
+
+
+def run(args):
+    stub, base_url = start_stub_server(
+        latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+    )
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    os.chdir(_scratch_dir())
+
+    # Imported only now: the client reads OPENAI_BASE_URL and the caches use relative paths
+    from helper_functions import llm, openai_client, json_output, moderation
+    from logics import customer_query_handler as handler
+    from benchmarks.bench_pipeline import QUERIES
+    llm.USE_COMPLETION_CACHE = False
+    handler.SEMANTIC_CACHE = False  # the queries repeat; measure the pipeline, not cache hits
+    moderation.USE_CACHE = False
+
+    # Warm-up turn builds the course index (embeddings) and the catalog
+    asyncio.run(handler.process_user_message_async([], QUERIES[0]))
+    stub.stats.reset()
+    openai_client.stats.reset()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': dict(stub.config),
+        'chat': bench_chat(handler, stub, args.turns, QUERIES),
+        'load': bench_load(handler, args.turns, args.in_flight, QUERIES),
+        'scraper': bench_scraper(args.pages, args.page_delay_ms),
+        'client': openai_client.stats.snapshot(),
+        'json_output': json_output.stats.snapshot(),
+    }
+    stub.shutdown()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Saved to {path}")
+
+
+def _flatten(report, prefix=''):
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(base_path, head_path):
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(head_path, encoding='utf-8') as f:
+        head = json.load(f)
+    base_flat, head_flat = _flatten(base), _flatten(head)
+    print(f"{'metric':<48} {base['commit']:>12} {head['commit']:>12} {'change':>9}")
+    for key in sorted(set(base_flat) & set(head_flat)):
+        if key.startswith('config.'):
+            continue
+        old, new = base_flat[key], head_flat[key]
+        change = f"{(new - old) / old * 100:+8.1f}%" if old else '       -'
+        print(f"{key:<48} {old:>12} {new:>12} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run')
+    run_parser.add_argument('turns', nargs='?', type=int, default=20)
+    run_parser.add_argument('--in-flight', type=int, default=4)
+    run_parser.add_argument('--latency-ms', type=int, default=50)
+    run_parser.add_argument('--tokens-per-second', type=int, default=200)
+    run_parser.add_argument('--error-rate', type=float, default=0.0)
+    run_parser.add_argument('--pages', type=int, default=40)
+    run_parser.add_argument('--page-delay-ms', type=int, default=200)
+    compare_parser = sub.add_parser('compare')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args.base, args.head)
+
+
+if __name__ == "__main__":
+    main()
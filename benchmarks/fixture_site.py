@@ -0,0 +1,60 @@
+# Local HTTP site for scraper benchmarks.
+# GET /page/<n>?delay=<ms> answers after `delay` milliseconds with a small
+# HTML page titled "Fixture page <n>" that pulls in a stylesheet, a font and
+# two images from /static/ (so fetch profiles have something to block), and a
+# fee / dates / duration block for the "extract" profile.
+# Each host:port counts as its own host, so start several servers to
+# exercise per-host limits.
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+STATIC_BYTES = 64 * 1024
+STATIC_TYPES = {
+    'style.css': 'text/css',
+    'font.woff2': 'font/woff2',
+    'a.png': 'image/png',
+    'b.png': 'image/png',
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        delay_ms = int(query.get('delay', ['0'])[0])
+        time.sleep(delay_ms / 1000)
+        name = parts.path.rstrip('/').split('/')[-1] or 'index'
+        if parts.path.startswith('/static/'):
+            self._send(b' ' * STATIC_BYTES, STATIC_TYPES.get(name, 'application/octet-stream'))
+            return
+        body = (
+            f"<html><head><title>Fixture page {name}</title>"
+            f"<link rel='stylesheet' href='/static/style.css?delay={delay_ms // 4}'>"
+            f"<link rel='preload' as='font' href='/static/font.woff2' crossorigin>"
+            f"</head><body><h1>Fixture page {name}</h1><p>{'Course details. ' * 40}</p>"
+            f"<dl><dt>Course Fee</dt><dd>$600.00</dd><dt>Start Date</dt><dd>5/9/2025</dd>"
+            f"<dt>End Date</dt><dd>5/9/2025</dd><dt>Duration</dt><dd>7 hrs</dd></dl>"
+            f"<img src='/static/a.png?delay={delay_ms // 4}'><img src='/static/b.png'></body></html>"
+        ).encode('utf-8')
+        self._send(body, 'text/html; charset=utf-8')
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_site(port=0, handler=FixtureHandler):
+    """Start the site on a background thread. Returns (server, base_url)."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
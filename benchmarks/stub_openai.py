@@ -0,0 +1,219 @@
+# Local stand-in for the OpenAI endpoints the app uses, for offline benchmarks.
+#   POST /v1/chat/completions  (plain, streamed, json_object and json_schema)
+#   POST /v1/embeddings        (deterministic unit vectors per input text)
+#   POST /v1/moderations       (never flagged, unless the text contains FLAG_WORD)
+# Latency, token rate and error injection are set per server:
+#   latency_ms        - delay before the first byte of every response
+#   tokens_per_second - streaming rate of completion tokens (0 = as fast as possible)
+#   completion_tokens - length of a generated answer, in (approximate) tokens
+#   error_rate        - fraction of requests answered with `error_status`
+#   error_status      - 429 (sent with Retry-After: retry_after) or any 5xx
+# Point the app at it with OPENAI_BASE_URL=<base_url> and any OPENAI_API_KEY.
+# Run standalone:  python -m benchmarks.stub_openai [port]
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FLAG_WORD = 'STUB_FLAGGED'
+EMBEDDING_DIMENSIONS = 1536
+MODERATION_CATEGORIES = ('harassment', 'hate', 'self-harm', 'sexual', 'violence')
+
+DEFAULT_CONFIG = {
+    'latency_ms': 50,
+    'tokens_per_second': 200,
+    'completion_tokens': 150,
+    'error_rate': 0.0,
+    'error_status': 429,
+    'retry_after': 0.1,
+    'seed': 0,
+}
+
+
+def _approx_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _answer_words(n_tokens):
+    words = ["Here", "are", "some", "courses", "that", "match", "what", "you", "asked", "for."]
+    answer = ' '.join(words[i % len(words)] for i in range(max(1, n_tokens - 12)))
+    # Same shape as the real answer prompt, so section filtering and moderation behave as usual
+    return f"Step 1:#### Relevant courses found.\nStep 2:#### Checked the details.\nStep 3:#### {answer}"
+
+
+def _sample(schema):
+    """Smallest value that satisfies the (strict) JSON schema."""
+    kind = schema.get('type')
+    if kind == 'object':
+        return {k: _sample(v) for k, v in schema.get('properties', {}).items()}
+    if kind == 'array':
+        return [_sample(schema['items'])] if 'items' in schema else []
+    if 'enum' in schema:
+        return schema['enum'][0]
+    return {'string': 'stub', 'integer': 1, 'number': 1.0, 'boolean': False}.get(kind)
+
+
+class StubStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.values = {'requests': 0, 'errors_injected': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def add(self, **amounts):
+        with self._lock:
+            for k, v in amounts.items():
+                self.values[k] += v
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so client connection pooling is exercised
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self.server.stats.add(requests=1)
+        time.sleep(self.config['latency_ms'] / 1000)
+        if self.server.random.random() < self.config['error_rate']:
+            self.server.stats.add(errors_injected=1)
+            self._error(self.config['error_status'])
+            return
+        path = self.path.rstrip('/')
+        if path.endswith('/chat/completions'):
+            self._chat(body)
+        elif path.endswith('/embeddings'):
+            self._embeddings(body)
+        elif path.endswith('/moderations'):
+            self._moderations(body)
+        else:
+            self._json({'error': {'message': f'unknown path {self.path}'}}, status=404)
+
+    def _chat(self, body):
+        prompt = ' '.join(str(m.get('content') or '') for m in body.get('messages', []))
+        prompt_tokens = _approx_tokens(prompt)
+        response_format = body.get('response_format') or {}
+        if response_format.get('type') == 'json_schema':
+            content = json.dumps(_sample(response_format['json_schema']['schema']))
+        elif response_format.get('type') == 'json_object':
+            content = json.dumps({'selected': [1, 2, 3]})
+        else:
+            content = _answer_words(min(self.config['completion_tokens'], body.get('max_tokens') or 1024))
+        completion_tokens = _approx_tokens(content)
+        self.server.stats.add(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                 'total_tokens': prompt_tokens + completion_tokens}
+        base = {'id': 'chatcmpl-stub', 'created': int(time.time()), 'model': body.get('model', 'stub')}
+
+        if not body.get('stream'):
+            self._json(dict(base, object='chat.completion', usage=usage, choices=[{
+                'index': 0, 'finish_reason': 'stop',
+                'message': {'role': 'assistant', 'content': content},
+            }]))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        rate = self.config['tokens_per_second']
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]  # ~1 token each
+        for piece in pieces:
+            self._event(dict(base, object='chat.completion.chunk', choices=[{
+                'index': 0, 'finish_reason': None, 'delta': {'content': piece},
+            }]))
+            if rate:
+                time.sleep(1 / rate)
+        self._event(dict(base, object='chat.completion.chunk', choices=[{
+            'index': 0, 'finish_reason': 'stop', 'delta': {},
+        }]))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            self._event(dict(base, object='chat.completion.chunk', choices=[], usage=usage))
+        self._chunk(b'data: [DONE]\n\n')
+        self._chunk(b'')
+
+    def _embeddings(self, body):
+        inputs = body.get('input')
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        data = []
+        for i, text in enumerate(inputs):
+            seed = int.from_bytes(hashlib.sha256(str(text).encode('utf-8')).digest()[:8], 'little')
+            rng = random.Random(seed)
+            vector = [rng.gauss(0, 1) for _ in range(EMBEDDING_DIMENSIONS)]
+            norm = sum(v * v for v in vector) ** 0.5
+            data.append({'object': 'embedding', 'index': i, 'embedding': [v / norm for v in vector]})
+        tokens = sum(_approx_tokens(str(t)) for t in inputs)
+        self.server.stats.add(prompt_tokens=tokens)
+        self._json({'object': 'list', 'model': body.get('model', 'stub'), 'data': data,
+                    'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}})
+
+    def _moderations(self, body):
+        inputs = body.get('input')
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        results = []
+        for text in inputs:
+            flagged = FLAG_WORD in str(text)
+            results.append({
+                'flagged': flagged,
+                'categories': {c: flagged for c in MODERATION_CATEGORIES},
+                'category_scores': {c: 0.9 if flagged else 0.0 for c in MODERATION_CATEGORIES},
+            })
+        self._json({'id': 'modr-stub', 'model': 'omni-moderation-latest', 'results': results})
+
+    def _error(self, status):
+        headers = {'Retry-After': str(self.config['retry_after'])} if status == 429 else {}
+        self._json({'error': {'message': 'injected error', 'type': 'stub', 'code': status}}, status, headers)
+
+    def _json(self, payload, status=200, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _event(self, payload):
+        self._chunk(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port=0, **config):
+    """Start the stub on a background thread. Returns (server, base_url).
+
+    server.config can be changed while it runs; server.stats counts requests and tokens.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.config = dict(DEFAULT_CONFIG, **config)
+    server.stats = StubStats()
+    server.random = random.Random(server.config['seed'])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    server, base_url = start_stub_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"OpenAI stub listening on {base_url}  (OPENAI_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
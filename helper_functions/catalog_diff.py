@@ -0,0 +1,146 @@
+import csv
+import sys
+import json
+import asyncio
+from helper_functions.extractors import parse_cost, parse_date, parse_duration
+from helper_functions.url_canonical import canonicalize_url
+
+# Compares values extracted from course pages with courses.csv and emits a
+# change set. Works as one streaming pass: the catalog is indexed by canonical
+# URL once (only the compared columns are kept), then extraction records are
+# read one at a time and changes are written out as they are found, so
+# thousands of pages never need to be held in memory or in DataFrames.
+#
+#   python -m helper_functions.catalog_diff extract <courses.csv> <extractions.jsonl>
+#   python -m helper_functions.catalog_diff diff <extractions.jsonl> <changes.csv> [courses.csv]
+
+EXTRACT_BATCH_SIZE = 64
+
+# extracted field -> (courses.csv column, parser for the current CSV value)
+FIELD_COLUMNS = {
+    'cost': ('Cost', parse_cost),
+    'start_date': ('Start Date', parse_date),
+    'end_date': ('End Date', parse_date),
+    'duration': ('Training Period', parse_duration),
+}
+CHANGE_COLUMNS = ['Course Title', 'URL', 'field', 'column', 'current', 'current_parsed', 'extracted']
+
+
+def index_catalog(csv_path):
+    """{canonical url: [row dicts]} with only the columns the diff needs.
+
+    A course listed under several competencies appears once per distinct set of values.
+    """
+    index = {}
+    keep = ['Course Title', 'URL'] + [column for column, _ in FIELD_COLUMNS.values()]
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            row = {k.strip(): (v or '').strip() for k, v in row.items() if k}
+            if not row.get('URL'):
+                continue
+            rows = index.setdefault(canonicalize_url(row['URL']), [])
+            kept = {k: row.get(k, '') for k in keep}
+            if kept not in rows:
+                rows.append(kept)
+    return index
+
+
+def _differs(field, current, extracted):
+    if current is None:
+        return True
+    if field == 'duration':
+        # Only compare like with like (hours vs hours, days vs days)
+        unit = next(iter(extracted))
+        return unit in current and current[unit] != extracted[unit]
+    if field == 'cost':
+        return abs(current - extracted) > 0.005
+    return current != extracted
+
+
+def diff_records(extraction_records, catalog_index):
+    """Yield one change dict per field whose extracted value differs from the catalog.
+
+    `extraction_records` is any iterable of {"URL": ..., "fields": {...}}.
+    """
+    for record in extraction_records:
+        fields = record.get('fields') or {}
+        if not fields:
+            continue
+        for row in catalog_index.get(canonicalize_url(record['URL']), []):
+            for field, extracted in fields.items():
+                if field not in FIELD_COLUMNS:
+                    continue
+                column, parser = FIELD_COLUMNS[field]
+                current = parser(row.get(column))
+                if _differs(field, current, extracted):
+                    yield {
+                        'Course Title': row['Course Title'],
+                        'URL': row['URL'],
+                        'field': field,
+                        'column': column,
+                        'current': row.get(column, ''),
+                        'current_parsed': json.dumps(current),
+                        'extracted': json.dumps(extracted),
+                    }
+
+
+async def extract_to_jsonl(csv_path, out_path, progress_callback=None, batch_size=EXTRACT_BATCH_SIZE,
+                           **browser_options):
+    """Run the page extractors over every distinct catalog URL, appending one
+    {"URL", "fields", "raw"} record per page to `out_path` as each batch finishes."""
+    # Imported here so the diff itself runs without Playwright installed
+    from helper_functions import scraper
+
+    urls = list(index_catalog(csv_path))
+    browser_options.setdefault('profile', 'extract')
+    with open(out_path, 'w', encoding='utf-8') as out:
+        for start in range(0, len(urls), batch_size):
+            batch = urls[start:start + batch_size]
+            for result in await scraper.scrape_url_data(batch, **browser_options):
+                extracted = result.get('extracted') or {}
+                out.write(json.dumps({'URL': result['URL'], 'fields': extracted.get('fields', {}),
+                                      'raw': extracted.get('raw', {})}) + '\n')
+            out.flush()
+            if progress_callback:
+                progress_callback(min(1.0, (start + len(batch)) / len(urls)))
+    return len(urls)
+
+
+def read_jsonl(path):
+    """Stream extraction records from a JSONL file (one record, or {"result": record}, per line)."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record = record.get('result', record)
+            extracted = record.get('extracted')
+            if extracted is not None:
+                record = {'URL': record['URL'], 'fields': extracted.get('fields', {})}
+            yield record
+
+
+def write_change_set(changes, out_path):
+    """Write changes to CSV as they are produced. Returns the number written."""
+    count = 0
+    with open(out_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CHANGE_COLUMNS)
+        writer.writeheader()
+        for change in changes:
+            writer.writerow(change)
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    command, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else (None, [])
+    if command == 'extract' and len(args) == 2:
+        pages = asyncio.run(extract_to_jsonl(args[0], args[1]))
+        print(f"{pages} page(s) extracted to {args[1]}")
+    elif command == 'diff' and len(args) in (2, 3):
+        catalog_csv = args[2] if len(args) == 3 else './data/courses.csv'
+        written = write_change_set(diff_records(read_jsonl(args[0]), index_catalog(catalog_csv)), args[1])
+        print(f"{written} change(s) written to {args[1]}")
+    else:
+        print("usage: python -m helper_functions.catalog_diff extract <courses.csv> <extractions.jsonl>\n"
+              "       python -m helper_functions.catalog_diff diff <extractions.jsonl> <changes.csv> [courses.csv]")
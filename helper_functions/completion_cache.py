@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Local cache for chat completions.
+# All our calls run at temperature=0, so the same model + messages + sampling
+# params give (near enough) the same answer. Entries expire after a TTL, the
+# table is trimmed to `max_entries` by least-recent use, and everything is
+# dropped when courses.csv changes because the catalog is baked into the prompts.
+
+DEFAULT_PATH = './data/cache/completions.sqlite'
+CATALOG_PATH = './data/courses.csv'
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def make_key(model, messages, **params):
+    """Canonical hash of everything that influences the completion."""
+    payload = {'model': model, 'messages': messages, 'params': params}
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(path):
+    """sha256 of the file contents, or '' if it does not exist."""
+    if not os.path.exists(path):
+        return ''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CompletionCache:
+    def __init__(self, path=DEFAULT_PATH, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES, catalog_path=CATALOG_PATH):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.catalog_path = catalog_path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._catalog_stat = None
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS completions ('
+            ' key TEXT PRIMARY KEY,'
+            ' response TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' last_access REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON completions (last_access)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        self._conn.commit()
+
+    def _check_catalog(self):
+        """Clear the cache if the catalog file changed since we last looked."""
+        if not self.catalog_path:
+            return
+        try:
+            st = os.stat(self.catalog_path)
+            stat = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stat = None
+        if stat == self._catalog_stat:
+            return
+        # Only hash the file when its stat changed
+        fingerprint = file_fingerprint(self.catalog_path)
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'catalog'").fetchone()
+        if row is None or row[0] != fingerprint:
+            self._conn.execute('DELETE FROM completions')
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('catalog', ?)", (fingerprint,))
+            self._conn.commit()
+        self._catalog_stat = stat
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            self._check_catalog()
+            row = self._conn.execute(
+                'SELECT response, created_at FROM completions WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute('DELETE FROM completions WHERE key = ?', (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE completions SET last_access = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._check_catalog()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO completions (key, response, created_at, last_access) VALUES (?, ?, ?, ?)',
+                (key, response, now, now),
+            )
+            count = self._conn.execute('SELECT COUNT(*) FROM completions').fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self._conn.execute(
+                    'DELETE FROM completions WHERE key IN '
+                    '(SELECT key FROM completions ORDER BY last_access ASC LIMIT ?)', (excess,)
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM completions')
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute('SELECT COUNT(*) FROM completions').fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': size,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide default cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CompletionCache()
+    return _cache
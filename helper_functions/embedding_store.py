@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+# On-disk embedding store keyed by (model, sha256(text)).
+# Vectors are kept as raw float32 bytes, so a lookup is one indexed SELECT
+# and nothing is ever embedded twice for the same model and text.
+
+DEFAULT_PATH = './data/cache/embeddings.sqlite'
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # One connection shared across threads, serialised by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            ' model TEXT NOT NULL,'
+            ' text_hash TEXT NOT NULL,'
+            ' vector BLOB NOT NULL,'
+            ' PRIMARY KEY (model, text_hash))'
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        """Return {hash: vector} for the hashes that are already stored."""
+        found = {}
+        hashes = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})',
+                    [model, *chunk],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, items):
+        """Store an iterable of (hash, vector) pairs."""
+        rows = [(model, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items]
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)', rows
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide default store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EmbeddingStore()
+    return _store
@@ -0,0 +1,164 @@
+import re
+from datetime import datetime
+from urllib.parse import urlsplit
+
+# Per-domain extractors for course pages.
+# Each extractor runs in the page (one page.evaluate call) and pulls raw text
+# for the catalog fields we care about, either from CSS selectors or from the
+# value next to a label such as "Course Fee" or "Start Date". The raw strings
+# are then parsed into typed values: cost (float, SGD), start/end dates
+# (ISO date strings) and duration ({"hours": n} or {"days": n}).
+# Register new sites with register_extractor().
+
+EXTRACT_SCRIPT = r"""(spec) => {
+    const clean = (s) => (s || '').replace(/\s+/g, ' ').trim();
+    const out = {};
+    for (const [field, selector] of Object.entries(spec.selectors || {})) {
+        const el = document.querySelector(selector);
+        if (el && clean(el.textContent)) out[field] = clean(el.textContent).slice(0, 200);
+    }
+    const nodes = document.querySelectorAll('dt, th, td, label, strong, b, span, div, p, li, h4, h5, h6');
+    for (const [field, labels] of Object.entries(spec.labels || {})) {
+        if (out[field]) continue;
+        const re = new RegExp('^(' + labels.join('|') + ')\\s*:?\\s*', 'i');
+        for (const el of nodes) {
+            if (el.children.length > 3) continue;
+            const text = clean(el.textContent);
+            if (!text || text.length > 200) continue;
+            const m = text.match(re);
+            if (!m) continue;
+            let value = clean(text.slice(m[0].length));
+            if (!value) {
+                const next = el.nextElementSibling;
+                value = clean(next && next.textContent);
+            }
+            if (value) {
+                out[field] = value.slice(0, 200);
+                break;
+            }
+        }
+    }
+    return out;
+}"""
+
+DEFAULT_LABELS = {
+    'cost': ['course fee', 'course fees', 'fee', 'fees', 'price', 'cost', 'full fee'],
+    'start_date': ['start date', 'commencement date', 'course date', 'date'],
+    'end_date': ['end date', 'completion date'],
+    'duration': ['duration', 'training hours', 'course duration', 'no\\. of hours', 'hours'],
+}
+
+NOT_AVAILABLE = {'', 'tba', 'nil', 'na', 'n/a', 'otot', '-'}
+COST_PATTERN = re.compile(r'(?:S\$|SGD|\$)\s*([\d,]+(?:\.\d+)?)|^([\d,]+(?:\.\d+)?)$', re.IGNORECASE)
+DATE_PATTERN = re.compile(
+    r'\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{4}|\d{1,2}[ -][A-Za-z]{3,9}[ ,-]*\d{4}'
+)
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d %b %Y', '%d %B %Y', '%d-%b-%Y', '%d-%B-%Y')
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(hrs?|hours?|days?)\b', re.IGNORECASE)
+
+
+def parse_cost(text):
+    text = str(text or '').strip()
+    if text.lower() in NOT_AVAILABLE:
+        return None
+    match = COST_PATTERN.search(text)
+    if not match:
+        return None
+    return float((match.group(1) or match.group(2)).replace(',', ''))
+
+
+def parse_date(text):
+    """ISO date string for the first date found in `text`, or None."""
+    text = str(text or '').strip()
+    if text.lower() in NOT_AVAILABLE:
+        return None
+    match = DATE_PATTERN.search(text)
+    if not match:
+        return None
+    candidate = re.sub(r'[ ,]+', ' ', match.group(0)).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(candidate, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_duration(text):
+    """{"hours": n} or {"days": n} from text such as "7HRS", "2 days"; None if absent."""
+    match = DURATION_PATTERN.search(str(text or ''))
+    if not match:
+        return None
+    unit = 'days' if match.group(2).lower().startswith('day') else 'hours'
+    return {unit: float(match.group(1))}
+
+
+FIELD_PARSERS = {
+    'cost': parse_cost,
+    'start_date': parse_date,
+    'end_date': parse_date,
+    'duration': parse_duration,
+}
+
+
+def parse_fields(raw):
+    """Typed values from the raw strings an extractor returned (missing fields are left out)."""
+    fields = {}
+    for name, parser in FIELD_PARSERS.items():
+        value = parser(raw.get(name))
+        if value is not None:
+            fields[name] = value
+    return fields
+
+
+class Extractor:
+    def __init__(self, labels=None, selectors=None):
+        self.labels = labels or DEFAULT_LABELS
+        self.selectors = selectors or {}
+
+    async def extract(self, page):
+        raw = await page.evaluate(EXTRACT_SCRIPT, {'labels': self.labels, 'selectors': self.selectors})
+        return {'raw': raw, 'fields': parse_fields(raw)}
+
+
+EXTRACTORS = {}
+DEFAULT_EXTRACTOR = Extractor()
+
+
+def register_extractor(host, extractor):
+    """Use `extractor` for `host` and its subdomains."""
+    EXTRACTORS[host.lower()] = extractor
+
+
+def extractor_for(url):
+    host = urlsplit(url).netloc.lower()
+    while host:
+        if host in EXTRACTORS:
+            return EXTRACTORS[host]
+        host = host.partition('.')[2]
+    return DEFAULT_EXTRACTOR
+
+
+register_extractor('learn.gov.sg', Extractor(labels={
+    **DEFAULT_LABELS,
+    'cost': ['programme fee', 'course fee', 'fee'],
+    'duration': ['duration', 'programme duration', 'no\\. of hours'],
+}))
+register_extractor('isca.org.sg', Extractor(labels={
+    **DEFAULT_LABELS,
+    'cost': ['member fee', 'member price', 'non-member fee', 'course fee', 'fee'],
+    'start_date': ['start date', 'course date', 'date'],
+    'duration': ['cpe hours', 'duration', 'hours'],
+}))
+register_extractor('iia.org.sg', Extractor(labels={
+    **DEFAULT_LABELS,
+    'cost': ['member', 'members', 'fee', 'fees'],
+    'start_date': ['date', 'event date', 'start date'],
+    'duration': ['cpe', 'cpe hours', 'duration'],
+}))
+register_extractor('academy.smu.edu.sg', Extractor(labels={
+    **DEFAULT_LABELS,
+    'cost': ['full fee', 'course fee', 'programme fee', 'fee'],
+    'start_date': ['next intake', 'start date', 'course date'],
+    'duration': ['duration', 'total training hours'],
+}))
@@ -0,0 +1,194 @@
+import json
+import threading
+from helper_functions import llm
+
+# Structured (JSON) completions.
+# The request carries a strict JSON schema, so a well-behaved model can only
+# answer with a matching object. Replies are still parsed tolerantly (code
+# fences, prose around the JSON, output cut off by max_tokens) and checked
+# against the schema; a reply that still fails gets one repair round trip that
+# quotes the error back to the model. Everything is counted in `stats`.
+
+MAX_REPAIR_ATTEMPTS = 1
+
+
+class JSONOutputError(ValueError):
+    pass
+
+
+class PartialJSONParser:
+    """Tolerant, incremental JSON parser.
+
+    feed() text as it arrives (a stream, or a whole reply in one go); value()
+    returns the first JSON value found so far, with unterminated strings and
+    containers closed, or None if nothing usable has arrived yet.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.start = None
+        self.stack = []         # expected closing brackets
+        self.in_string = False
+        self.escaped = False
+        self.done = False
+        self.end = None
+        self.last_comma = None  # (position, open brackets there): everything before it is complete
+        self.scanned = 0
+
+    def feed(self, delta):
+        self.text += delta
+        self._scan()
+        return self.value()
+
+    def _scan(self):
+        text = self.text
+        i = self.scanned
+        while i < len(text) and not self.done:
+            char = text[i]
+            if self.start is None:
+                if char in '{[':
+                    self.start = i
+                    self.stack.append('}' if char == '{' else ']')
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.stack.append('}' if char == '{' else ']')
+            elif char == ',':
+                self.last_comma = (i, list(self.stack))
+            elif char in '}]':
+                if self.stack:
+                    self.stack.pop()
+                if not self.stack:
+                    self.done = True
+                    self.end = i + 1
+            i += 1
+        self.scanned = i
+
+    def value(self):
+        if self.start is None:
+            return None
+        if self.done:
+            return json.loads(self.text[self.start:self.end])
+        # Close what is still open; failing that, drop everything after the last comma
+        body = self.text[self.start:]
+        if self.escaped:
+            body = body[:-1]
+        if self.in_string:
+            body += '"'
+        candidates = [body + ''.join(reversed(self.stack))]
+        if self.last_comma is not None:
+            position, stack = self.last_comma
+            candidates.append(self.text[self.start:position] + ''.join(reversed(stack)))
+        for candidate in candidates:
+            try:
+                return json.loads(candidate)
+            except ValueError:
+                continue
+        return None
+
+
+def parse_tolerant(text):
+    """First JSON value in `text`, repairing truncation; raises JSONOutputError if there is none."""
+    parser = PartialJSONParser()
+    try:
+        value = parser.feed(text or '')
+    except ValueError as e:
+        raise JSONOutputError(f"invalid JSON: {e}") from e
+    if value is None:
+        raise JSONOutputError("no JSON object in the reply")
+    return value
+
+
+_TYPES = {'object': dict, 'array': list, 'string': str, 'integer': int, 'number': (int, float), 'boolean': bool}
+
+
+def validate(value, schema, path='$'):
+    """Check `value` against the subset of JSON schema we use (type, properties, required, items, enum)."""
+    expected = schema.get('type')
+    wrong_type = expected and not isinstance(value, _TYPES[expected])
+    if wrong_type or (expected in ('integer', 'number') and isinstance(value, bool)):
+        raise JSONOutputError(f"{path}: expected {expected}, got {type(value).__name__}")
+    if 'enum' in schema and value not in schema['enum']:
+        raise JSONOutputError(f"{path}: {value!r} is not one of {schema['enum']}")
+    if expected == 'object':
+        for key in schema.get('required', []):
+            if key not in value:
+                raise JSONOutputError(f"{path}: missing '{key}'")
+        for key, sub_schema in schema.get('properties', {}).items():
+            if key in value:
+                validate(value[key], sub_schema, f"{path}.{key}")
+    elif expected == 'array' and 'items' in schema:
+        for i, item in enumerate(value):
+            validate(item, schema['items'], f"{path}[{i}]")
+
+
+def strict_schema(name, schema):
+    """response_format for a strict JSON schema."""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+class JSONOutputStats:
+    FIELDS = ('calls', 'ok_first_try', 'recovered_locally', 'repairs', 'failures', 'wasted_tokens')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, field, amount=1):
+        with self._lock:
+            self._values[field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+stats = JSONOutputStats()
+
+
+def _parse_reply(reply, schema):
+    """(value, needed_local_repair). Raises JSONOutputError."""
+    try:
+        value = json.loads(reply)
+        repaired = False
+    except (TypeError, ValueError):
+        value = parse_tolerant(reply)
+        repaired = True
+    validate(value, schema)
+    return value, repaired
+
+
+def complete_json(messages, name, schema, default=None, max_repairs=MAX_REPAIR_ATTEMPTS, **completion_options):
+    """Completion constrained to `schema`; returns the parsed value, or `default` if every attempt fails."""
+    stats.add('calls')
+    response_format = strict_schema(name, schema)
+    messages = list(messages)
+    for attempt in range(max_repairs + 1):
+        reply = llm.get_completion_by_messages(messages, response_format=response_format, **completion_options)
+        try:
+            value, repaired = _parse_reply(reply, schema)
+        except JSONOutputError as e:
+            stats.add('wasted_tokens', llm.count_tokens_from_message(messages) + llm.count_tokens(reply or ''))
+            if attempt == max_repairs:
+                break
+            stats.add('repairs')
+            messages = messages + [
+                {'role': 'assistant', 'content': reply or ''},
+                {'role': 'user', 'content': f"That reply was not valid ({e}). "
+                                            f"Answer again with only a JSON object matching the schema."},
+            ]
+            continue
+        if repaired:
+            stats.add('recovered_locally')
+        elif attempt == 0:
+            stats.add('ok_first_try')
+        return value
+    stats.add('failures')
+    return default
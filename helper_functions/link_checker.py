@@ -0,0 +1,239 @@
+import re
+import html
+import time
+import hashlib
+import asyncio
+import httpx
+from helper_functions import scraper
+
+# Two-tier link checker.
+# Tier 1 ("http") probes every URL with a pooled keep-alive HTTP client:
+# HEAD first, GET when HEAD is refused or the page is HTML (to read <title>).
+# Only URLs that look JavaScript-rendered or gave an ambiguous answer
+# (timeouts, bot walls, server errors) go to tier 2 ("browser"), the
+# Playwright scraper.
+
+HTTP_TIMEOUT_SECONDS = 15
+MAX_HTML_BYTES = 256 * 1024
+DEFAULT_CONCURRENCY = 32
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+# HEAD is often not implemented or blocked even when GET works
+HEAD_FALLBACK_STATUSES = {403, 405, 501}
+# Statuses we do not trust without a real browser (bot protection, throttling, outages)
+AMBIGUOUS_STATUSES = {401, 403, 429, 500, 502, 503, 504}
+JS_MARKERS = (
+    'javascript is required',
+    'enable javascript',
+    'requires javascript',
+    'you need to enable javascript',
+)
+
+TITLE_PATTERN = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+BODY_PATTERN = re.compile(r'<body[^>]*>(.*)', re.IGNORECASE | re.DOTALL)
+DROP_PATTERN = re.compile(r'<(script|style|noscript)[^>]*>.*?</\1>', re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+SPACE_PATTERN = re.compile(r'\s+')
+
+
+def extract_title(markup):
+    match = TITLE_PATTERN.search(markup)
+    return SPACE_PATTERN.sub(' ', html.unescape(match.group(1))).strip() if match else ''
+
+
+def extract_snippet(markup, length=300):
+    match = BODY_PATTERN.search(markup)
+    body = match.group(1) if match else markup
+    text = TAG_PATTERN.sub(' ', DROP_PATTERN.sub(' ', body))
+    return SPACE_PATTERN.sub(' ', html.unescape(text)).strip()[:length]
+
+
+def needs_browser(markup, title, snippet):
+    """True when the static HTML is clearly not the page a user would see."""
+    lowered = markup.lower()
+    if any(marker in lowered for marker in JS_MARKERS):
+        return True
+    # An empty shell (SPA root div, no title) will only render in a browser
+    return not title and len(snippet) < 50
+
+
+def _result(url, title, snippet, status_code, final_url, tier):
+    return {
+        "URL": url,
+        "title": title,
+        "snippet": snippet,
+        "status_code": status_code,
+        "final_url": final_url,
+        "tier": tier,
+    }
+
+
+def _validators(response, body=b''):
+    """Cache validators kept for the next incremental run (not part of the output)."""
+    return {
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified'),
+        'content_hash': hashlib.sha256(body).hexdigest() if body else None,
+    }
+
+
+async def _read_html(client, url, headers=None):
+    async with client.stream('GET', url, headers=headers) as response:
+        chunks, size = [], 0
+        if response.status_code != 304 and 'html' in response.headers.get('content-type', 'text/html').lower():
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= MAX_HTML_BYTES:
+                    break
+        body = b''.join(chunks)
+        return response, body, body.decode(response.encoding or 'utf-8', errors='replace')
+
+
+def conditional_headers(validators):
+    headers = {}
+    if validators and validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators and validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+async def probe_url(client, url, validators=None):
+    """Tier 1 for one URL. Returns (result, escalate).
+
+    With `validators` from a previous run (etag / last_modified) a conditional GET
+    is sent straight away; a 304 comes back as status_code 304 with no title/snippet.
+    """
+    start = time.perf_counter()
+    result, escalate = await _probe(client, url, conditional_headers(validators))
+    result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return result, escalate
+
+
+async def _probe(client, url, headers):
+    try:
+        if not headers:
+            head = await client.head(url)
+            content_type = head.headers.get('content-type', '').lower()
+            if head.status_code not in HEAD_FALLBACK_STATUSES and head.status_code < 400 and 'html' not in content_type:
+                # A live non-HTML resource (PDF brochure etc.): HEAD is all we need
+                result = _result(url, '', content_type, head.status_code, str(head.url), 'http')
+                result['_validators'] = _validators(head)
+                return result, False
+            if head.status_code >= 400 and head.status_code not in HEAD_FALLBACK_STATUSES | AMBIGUOUS_STATUSES:
+                return _result(url, 'Error', f'HTTP {head.status_code}', head.status_code, str(head.url), 'http'), False
+
+        response, body, markup = await _read_html(client, url, headers=headers or None)
+        status, final_url = response.status_code, str(response.url)
+        if status == 304:
+            result = _result(url, '', '', status, final_url, 'http')
+            result['_validators'] = _validators(response)
+            return result, False
+        if status in AMBIGUOUS_STATUSES:
+            return _result(url, '', '', status, final_url, 'http'), True
+        if status >= 400:
+            return _result(url, 'Error', f'HTTP {status}', status, final_url, 'http'), False
+        title, snippet = extract_title(markup), extract_snippet(markup)
+        result = _result(url, title, snippet, status, final_url, 'http')
+        result['_validators'] = _validators(response, body)
+        return result, needs_browser(markup, title, snippet)
+    except (httpx.TimeoutException, httpx.TransportError) as e:
+        return _result(url, 'Error', str(e) or type(e).__name__, None, url, 'http'), True
+    except Exception as e:
+        return _result(url, 'Error', str(e), None, url, 'http'), True
+
+
+async def probe_urls(urls, concurrency=DEFAULT_CONCURRENCY, per_host_limit=scraper.DEFAULT_PER_HOST_LIMIT * 2,
+                     on_result=None, validators=None):
+    """Tier 1 for all URLs. Returns a list of (result, escalate) in input order.
+
+    `validators`, if given, is a list aligned with `urls` (None where there is nothing to send).
+    """
+    urls = list(urls)
+    validators = validators or [None] * len(urls)
+    outcomes = [None] * len(urls)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    overall = asyncio.Semaphore(concurrency)
+    host_limits = {}
+
+    async with httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=HTTP_TIMEOUT_SECONDS,
+        limits=limits,
+        headers={'User-Agent': USER_AGENT},
+    ) as client:
+        async def worker(i, url):
+            host = scraper.url_host(url)
+            if host not in host_limits:
+                host_limits[host] = asyncio.Semaphore(per_host_limit)
+            async with host_limits[host], overall:
+                outcomes[i] = await probe_url(client, url, validators[i])
+            if on_result:
+                on_result(i, *outcomes[i])
+
+        await asyncio.gather(*(worker(i, url) for i, url in enumerate(urls)))
+    return outcomes
+
+
+async def check_links(urls, progress_callback=None, validators=None, keep_validators=False, **browser_options):
+    """Probe every URL over plain HTTP and use Playwright only where needed.
+
+    Returns one dict per URL, in input order, with URL, title, snippet,
+    status_code, final_url, tier ("http" or "browser") and latency_ms.
+    With `keep_validators` each result also carries the "_validators" used
+    by the incremental scrape state.
+    """
+    urls = list(urls)
+    total = len(urls)
+    if not urls:
+        return []
+    done = 0
+
+    def report():
+        if progress_callback:
+            progress_callback(done / total)
+
+    def on_probe(i, result, escalate):
+        nonlocal done
+        if not escalate:
+            done += 1
+            report()
+
+    outcomes = await probe_urls(urls, on_result=on_probe, validators=validators)
+    results = [result for result, _ in outcomes]
+    escalated = [i for i, (_, escalate) in enumerate(outcomes) if escalate]
+
+    if escalated:
+        answered_before = done
+        # A link check does not need images, fonts or the full body
+        browser_options.setdefault('profile', 'link-check')
+
+        def on_browser_progress(fraction):
+            nonlocal done
+            done = answered_before + round(fraction * len(escalated))
+            report()
+
+        browser_results = await scraper.scrape_url_data(
+            [urls[i] for i in escalated], progress_callback=on_browser_progress, **browser_options
+        )
+        for i, browser_result in zip(escalated, browser_results):
+            probe = results[i]
+            merged = dict(browser_result, tier='browser')
+            # Keep what the HTTP probe learned if the browser could not tell us
+            if merged.get('status_code') is None:
+                merged['status_code'] = probe['status_code']
+            merged.setdefault('final_url', probe['final_url'])
+            merged['latency_ms'] = round(probe['latency_ms'] + merged.get('latency_ms', 0), 1)
+            body = f"{merged['title']}\n{merged['snippet']}".encode('utf-8')
+            merged['_validators'] = {
+                'etag': None, 'last_modified': None, 'content_hash': hashlib.sha256(body).hexdigest(),
+            }
+            results[i] = merged
+    if not keep_validators:
+        for result in results:
+            result.pop('_validators', None)
+    return results
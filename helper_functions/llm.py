@@ -1,67 +1,295 @@
 import os
+import re
+import time
 import streamlit as st
 from dotenv import load_dotenv
-from openai import OpenAI
 import tiktoken
+from functools import lru_cache
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from helper_functions import embedding_store
+from helper_functions import completion_cache
+from helper_functions import openai_client
+from helper_functions import tracing
 
-if load_dotenv('.env'):
-   # for local development
+if load_dotenv('.env') or os.getenv('OPENAI_API_KEY'):
+   # for local development (and benchmarks against the local stub)
    OPENAI_KEY = os.getenv('OPENAI_API_KEY')
 else:
    OPENAI_KEY = st.secrets['OPENAI_API_KEY']
 
 #Pass the API Key to the OpenAI Client
-client = OpenAI(api_key=OPENAI_KEY)
+# Pooled, with retries and rate limiting applied per call (see openai_client)
+client = openai_client.make_client(OPENAI_KEY)
+
+
+def get_async_client():
+    """Async client for the concurrent chatbot pipeline (one per event loop)."""
+    return openai_client.get_async_client(OPENAI_KEY)
+
 
 def get_embedding(input, model='text-embedding-3-small'):
-    response = client.embeddings.create(
-        input=input,
-        model=model
+    texts = [input] if isinstance(input, str) else input
+    start = time.perf_counter()
+    response = openai_client.call_with_retries(
+        lambda: client.embeddings.create(input=input, model=model),
+        tokens=sum(count_tokens(t) for t in texts),
     )
+    tracing.record_llm_call('embedding', model, prompt_tokens=_usage(response, 'prompt_tokens'),
+                            duration_ms=(time.perf_counter() - start) * 1000)
     return [x.embedding for x in response.data]
 
 
+# Bulk, cached version of get_embedding.
+# Texts are looked up in the on-disk store by (model, sha256(text)); only the misses
+# are sent, packed into batches by token count, with at most `max_in_flight`
+# requests running at once. Returns a float32 matrix in the same order as `texts`.
+MAX_BATCH_TOKENS = 8000
+MAX_BATCH_INPUTS = 2048
+
+
+def _token_batches(texts, max_batch_tokens=MAX_BATCH_TOKENS):
+    batches, current, current_tokens = [], [], 0
+    for text in texts:
+        n = count_tokens(text)
+        if current and (current_tokens + n > max_batch_tokens or len(current) == MAX_BATCH_INPUTS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def get_embeddings_cached(texts, model='text-embedding-3-small', store=None,
+                          max_batch_tokens=MAX_BATCH_TOKENS, max_in_flight=4):
+    if isinstance(texts, str):
+        texts = [texts]
+    store = store or embedding_store.get_store()
+    # The API rejects empty strings
+    texts = [t if t else ' ' for t in texts]
+    hashes = [embedding_store.text_key(t) for t in texts]
+    found = store.get_many(model, hashes)
+
+    misses = {}
+    for text, h in zip(texts, hashes):
+        if h not in found:
+            misses[h] = text
+    if misses:
+        batches = _token_batches(list(misses.values()), max_batch_tokens)
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            results = pool.map(lambda batch: get_embedding(batch, model=model), batches)
+            for batch, vectors in zip(batches, results):
+                items = [(embedding_store.text_key(t), v) for t, v in zip(batch, vectors)]
+                store.put_many(model, items)
+                for h, v in items:
+                    found[h] = np.asarray(v, dtype=np.float32)
+
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack([found[h] for h in hashes])
+
+
+def _usage(response, field):
+    usage = getattr(response, 'usage', None)
+    return getattr(usage, field, 0) or 0
+
+
+# Set LLM_CACHE=0 to always go to the API
+USE_COMPLETION_CACHE = os.getenv('LLM_CACHE', '1') == '1'
+
+
+# Shared by get_completion and get_completion_by_messages.
+# Deterministic calls (temperature=0) are answered from the local completion cache when possible.
+def _chat_completion(messages, model, temperature, top_p, max_tokens, response_format=None, use_cache=True):
+    cacheable = use_cache and USE_COMPLETION_CACHE and temperature == 0
+    if cacheable:
+        cache = completion_cache.get_cache()
+        key = completion_cache.make_key(
+            model, messages,
+            temperature=temperature, top_p=top_p, max_tokens=max_tokens, response_format=response_format,
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            tracing.record_llm_call('chat', model, cached=True)
+            return cached
+
+    start = time.perf_counter()
+    response = openai_client.call_with_retries(
+        lambda: client.chat.completions.create( #originally was openai.chat.completions
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            n=1,
+            response_format=response_format,
+        ),
+        tokens=count_tokens_from_message(messages) + max_tokens,
+    )
+    content = response.choices[0].message.content
+    tracing.record_llm_call('chat', model, prompt_tokens=_usage(response, 'prompt_tokens'),
+                            completion_tokens=_usage(response, 'completion_tokens'),
+                            duration_ms=(time.perf_counter() - start) * 1000)
+
+    if cacheable and content is not None:
+        cache.put(key, content)
+    return content
+
+
 # This is the "Updated" helper function for calling LLM
-def get_completion(prompt, model="gpt-4o-mini", temperature=0, top_p=1.0, max_tokens=1024, n=1, json_output=False):
-    if json_output == True:
+# json_output=True asks for any JSON object; pass a response_format dict
+# (see json_output.strict_schema) to enforce a JSON schema instead.
+def get_completion(prompt, model="gpt-4o-mini", temperature=0, top_p=1.0, max_tokens=1024, n=1, json_output=False, use_cache=True):
+    if isinstance(json_output, dict):
+      output_json_structure = json_output
+    elif json_output == True:
       output_json_structure = {"type": "json_object"}
     else:
       output_json_structure = None
 
     messages = [{"role": "user", "content": prompt}]
-    response = client.chat.completions.create( #originally was openai.chat.completions
-        model=model,
-        messages=messages,
-        temperature=temperature,
-        top_p=top_p,
-        max_tokens=max_tokens,
-        n=1,
-        response_format=output_json_structure,
-    )
-    return response.choices[0].message.content
+    return _chat_completion(messages, model, temperature, top_p, max_tokens,
+                            response_format=output_json_structure, use_cache=use_cache)
 
 
 # Note that this function directly take in "messages" as the parameter.
-def get_completion_by_messages(messages, model="gpt-4o-mini", temperature=0, top_p=1.0, max_tokens=1024, n=1):
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=temperature,
-        top_p=top_p,
-        max_tokens=max_tokens,
-        n=1
+def get_completion_by_messages(messages, model="gpt-4o-mini", temperature=0, top_p=1.0, max_tokens=1024, n=1, use_cache=True,
+                               response_format=None):
+    return _chat_completion(messages, model, temperature, top_p, max_tokens,
+                            response_format=response_format, use_cache=use_cache)
+
+
+# Async, streaming counterpart of get_completion_by_messages.
+# Yields text deltas as they arrive. A cached answer is yielded in one piece.
+async def stream_completion_by_messages_async(messages, model="gpt-4o-mini", temperature=0, top_p=1.0, max_tokens=1024, use_cache=True):
+    cacheable = use_cache and USE_COMPLETION_CACHE and temperature == 0
+    if cacheable:
+        cache = completion_cache.get_cache()
+        key = completion_cache.make_key(
+            model, messages,
+            temperature=temperature, top_p=top_p, max_tokens=max_tokens, response_format=None,
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            tracing.record_llm_call('chat_stream', model, cached=True)
+            yield cached
+            return
+
+    # Only opening the stream is retried; once deltas have been shown it is too late
+    async_client = get_async_client()
+    start = time.perf_counter()
+    stream = await openai_client.call_with_retries_async(
+        lambda: async_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            n=1,
+            stream=True,
+            stream_options={"include_usage": True},
+        ),
+        tokens=count_tokens_from_message(messages) + max_tokens,
     )
-    return response.choices[0].message.content
+    parts = []
+    usage = None
+    async for chunk in stream:
+        if chunk.usage:
+            usage = chunk  # the final chunk carries the token counts
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+    tracing.record_llm_call('chat_stream', model, prompt_tokens=_usage(usage, 'prompt_tokens'),
+                            completion_tokens=_usage(usage, 'completion_tokens'),
+                            duration_ms=(time.perf_counter() - start) * 1000)
+
+    if cacheable:
+        cache.put(key, ''.join(parts))
+
+
+class SectionFilter:
+    """Holds back streamed text until a section marker (a regex) appears.
+
+    feed() returns the part of each delta that should be shown. If the stream ends
+    without the marker, finish() falls back to the text after the last `fallback_delimiter`.
+    """
+
+    def __init__(self, marker_pattern, fallback_delimiter=None):
+        self.marker = re.compile(marker_pattern)
+        self.fallback_delimiter = fallback_delimiter
+        self.started = False
+        self._buffer = ''
+        self._emitted = False
+
+    def _emit(self, text):
+        if not self._emitted:
+            text = text.lstrip()
+            self._emitted = bool(text)
+        return text
+
+    def feed(self, delta):
+        if self.started:
+            return self._emit(delta)
+        self._buffer += delta
+        match = self.marker.search(self._buffer)
+        if match is None:
+            return ''
+        self.started = True
+        visible = self._buffer[match.end():]
+        self._buffer = ''
+        return self._emit(visible)
+
+    def finish(self):
+        if self.started:
+            return ''
+        text = self._buffer
+        self._buffer = ''
+        if self.fallback_delimiter:
+            text = text.split(self.fallback_delimiter)[-1]
+        return self._emit(text)
+
+
+def get_moderation_response(input):
+    """Full moderation response (results and model) for a string or a list of strings."""
+    start = time.perf_counter()
+    response = openai_client.call_with_retries(lambda: client.moderations.create(input=input))
+    tracing.record_llm_call('moderation', response.model, duration_ms=(time.perf_counter() - start) * 1000)
+    return response
+
+
+def get_moderation(input):
+    """Moderation results for a string or a list of strings."""
+    return get_moderation_response(input).results
+
+
+async def get_moderation_async(input):
+    """Async counterpart of get_moderation."""
+    async_client = get_async_client()
+    start = time.perf_counter()
+    response = await openai_client.call_with_retries_async(lambda: async_client.moderations.create(input=input))
+    tracing.record_llm_call('moderation', response.model, duration_ms=(time.perf_counter() - start) * 1000)
+    return response.results
 
 
 # This function is for calculating the tokens given the "message"
 # ⚠️ This is simplified implementation that is good enough for a rough estimation
+@lru_cache(maxsize=None)
+def get_encoding(model='gpt-4o-mini'):
+    # encoding_for_model is slow; build each encoder once per process
+    return tiktoken.encoding_for_model(model)
+
+
+# Counts are cached per text, so a chat message is only ever encoded once
+@lru_cache(maxsize=8192)
 def count_tokens(text):
-    encoding = tiktoken.encoding_for_model('gpt-4o-mini')
-    return len(encoding.encode(text))
+    return len(get_encoding().encode(text))
 
 
 def count_tokens_from_message(messages):
-    encoding = tiktoken.encoding_for_model('gpt-4o-mini')
-    value = ' '.join([x.get('content') for x in messages])
-    return len(encoding.encode(value))
+    value = ' '.join([x.get('content') or '' for x in messages])
+    return count_tokens(value)
@@ -0,0 +1,208 @@
+import os
+import time
+import queue
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from helper_functions import llm
+from helper_functions import tracing
+
+# Cached, batched moderation.
+# Results are cached by sha256 of the text (bounded LRU with a TTL), so repeated
+# inputs and cached replies are never re-checked. Misses go to one background
+# thread that waits a few milliseconds for more requests and sends everything it
+# collected as a single list-input moderation call. The thread is shared by all
+# sessions (each chat turn runs its own event loop), so concurrent users share
+# round trips instead of each paying for their own.
+# The batch call runs outside every caller's trace, so each caller records its
+# own moderation call, with its share of the batch latency.
+
+USE_CACHE = os.getenv('MODERATION_CACHE', '1') == '1'
+CACHE_MAX_ENTRIES = 10000
+CACHE_TTL_SECONDS = 24 * 60 * 60
+BATCH_WINDOW_SECONDS = int(os.getenv('MODERATION_BATCH_WINDOW_MS', '15')) / 1000
+MAX_BATCH_INPUTS = 32
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ModerationCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()   # key -> (value, stored at), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Cached (result, model) for `key`, or None."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if time.time() - item[1] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ModerationBatcher:
+    """Coalesces moderation requests from any thread or event loop into list-input calls."""
+
+    def __init__(self, window_seconds=BATCH_WINDOW_SECONDS, max_inputs=MAX_BATCH_INPUTS):
+        self.window_seconds = window_seconds
+        self.max_inputs = max_inputs
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.api_calls = 0
+        self.batched_inputs = 0
+
+    def submit(self, text):
+        """Future resolving to (result, model, share of the batch latency in ms) for `text`."""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='moderation-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_inputs:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                self._run_batch(self._collect())
+            except Exception:
+                continue  # one bad batch must never stop the thread every session waits on
+
+    def _run_batch(self, batch):
+        # Futures cancelled by their caller are dropped; the rest can no longer be
+        # cancelled, so resolving them below cannot fail. Identical texts are sent once.
+        waiting = OrderedDict()
+        for text, future in batch:
+            if future.set_running_or_notify_cancel():
+                waiting.setdefault(text, []).append(future)
+        if not waiting:
+            return
+        texts = list(waiting)
+        start = time.perf_counter()
+        try:
+            response = llm.get_moderation_response(texts)
+        except Exception as e:
+            for futures in waiting.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        share_ms = (time.perf_counter() - start) * 1000 / len(texts)
+        self.api_calls += 1
+        self.batched_inputs += len(texts)
+        for text, result in zip(texts, response.results):
+            for future in waiting[text]:
+                future.set_result((result, response.model, share_ms))
+
+
+class Moderator:
+    def __init__(self, cache=None, batcher=None):
+        self.cache = cache or ModerationCache()
+        self.batcher = batcher or ModerationBatcher()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, texts):
+        """(cached (result, model) or None per text, keys)."""
+        keys = [text_key(t) for t in texts]
+        cached = [self.cache.get(k) if USE_CACHE else None for k in keys]
+        misses = sum(1 for c in cached if c is None)
+        with self._lock:
+            self.hits += len(texts) - misses
+            self.misses += misses
+        return cached, keys
+
+    def _store(self, keys, cached, fetched):
+        """Results in input order; caches the fetched ones and records the call in the caller's trace."""
+        duration_ms = 0.0
+        for i, future in fetched.items():
+            result, model, share_ms = future.result()
+            cached[i] = (result, model)
+            duration_ms += share_ms
+            if USE_CACHE:
+                self.cache.put(keys[i], cached[i])
+        if cached:
+            tracing.record_llm_call('moderation', cached[0][1], duration_ms=duration_ms, cached=not fetched)
+        return [result for result, _ in cached]
+
+    def moderate(self, texts):
+        """Moderation results for a string or a list of strings, in order."""
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        cached, keys = self._lookup(texts)
+        fetched = {i: self.batcher.submit(t) for i, t in enumerate(texts) if cached[i] is None}
+        for future in fetched.values():
+            future.result()
+        return self._store(keys, cached, fetched)
+
+    async def moderate_async(self, texts):
+        """Async counterpart of moderate(); waits without blocking the event loop."""
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        cached, keys = self._lookup(texts)
+        fetched = {i: self.batcher.submit(t) for i, t in enumerate(texts) if cached[i] is None}
+        if fetched:
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in fetched.values()))
+        return self._store(keys, cached, fetched)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self.cache),
+            'api_calls': self.batcher.api_calls,
+            'inputs_per_call': self.batcher.batched_inputs / self.batcher.api_calls if self.batcher.api_calls else 0.0,
+        }
+
+
+_moderator = None
+_moderator_lock = threading.Lock()
+
+
+def get_moderator():
+    """Process-wide moderator shared by all sessions."""
+    global _moderator
+    if _moderator is None:
+        with _moderator_lock:
+            if _moderator is None:
+                _moderator = Moderator()
+    return _moderator
@@ -0,0 +1,228 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import weakref
+import contextlib
+from email.utils import parsedate_to_datetime
+import httpx
+import openai
+from openai import OpenAI, AsyncOpenAI
+
+# Client layer for the OpenAI API.
+# - One pooled HTTP client for sync calls and one per event loop for async calls
+#   (httpx async connections cannot outlive the loop that opened them, and every
+#   chat turn runs in its own asyncio.run). Async callers hold an
+#   async_client_session() so the loop's client is closed when they are done.
+# - Retries with jittered exponential backoff; Retry-After / retry-after-ms from a
+#   429 or 5xx response wins over our own delay.
+# - A client-side token bucket per quota (requests/min and tokens/min), so bursts
+#   wait on our side instead of turning into 429s.
+# - Counters safe to update from threads and coroutines alike.
+# Point OPENAI_BASE_URL at a local stub server to exercise all of this offline.
+
+BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+RPM_LIMIT = int(os.getenv('LLM_RPM_LIMIT', '500'))
+TPM_LIMIT = int(os.getenv('LLM_TPM_LIMIT', '200000'))
+MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.InternalServerError,
+)
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute, up to one minute's worth.
+
+    Callers reserve units and are told how long to wait; the balance may go
+    negative, which queues later callers behind earlier ones. A threading lock
+    keeps it correct across Streamlit threads and separate event loops.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Take `amount` units; returns the seconds to wait before using them."""
+        if self.capacity <= 0:
+            return 0.0  # limit disabled
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class ClientStats:
+    """Request counters shared by every call in the process."""
+
+    FIELDS = ('requests', 'retries', 'rate_limited', 'errors', 'throttle_wait_seconds', 'backoff_seconds')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, field, amount=1):
+        with self._lock:
+            self._values[field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values = dict.fromkeys(self.FIELDS, 0)
+
+
+stats = ClientStats()
+request_bucket = TokenBucket(RPM_LIMIT)
+token_bucket = TokenBucket(TPM_LIMIT)
+
+
+def _throttle_delay(tokens):
+    delay = max(request_bucket.reserve(1), token_bucket.reserve(tokens))
+    if delay:
+        stats.add('throttle_wait_seconds', delay)
+    return delay
+
+
+def retry_after_seconds(error):
+    """Server-requested delay from a failed response, or None."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass  # an HTTP date
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt, error=None):
+    """Delay before retry number `attempt` (0-based): Retry-After if given, else full jitter."""
+    requested = retry_after_seconds(error) if error is not None else None
+    if requested is not None:
+        return min(requested, BACKOFF_MAX_SECONDS)
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _on_error(error, attempt, max_retries):
+    """Count the failure; returns the backoff delay, or re-raises when we should give up."""
+    if isinstance(error, openai.RateLimitError):
+        stats.add('rate_limited')
+    if not isinstance(error, RETRYABLE_ERRORS) or attempt >= max_retries:
+        stats.add('errors')
+        raise error
+    delay = backoff_seconds(attempt, error)
+    stats.add('retries')
+    stats.add('backoff_seconds', delay)
+    return delay
+
+
+def call_with_retries(fn, tokens=0, max_retries=MAX_RETRIES):
+    """Run `fn()` (a sync API call) under the rate limiter and retry policy.
+
+    Every attempt, retries included, is reserved against the buckets; a retry
+    waits for the longer of its backoff and the limiter.
+    """
+    attempt = 0
+    backoff = 0.0
+    while True:
+        time.sleep(max(backoff, _throttle_delay(tokens)))
+        stats.add('requests')
+        try:
+            return fn()
+        except Exception as e:
+            backoff = _on_error(e, attempt, max_retries)
+            attempt += 1
+
+
+async def call_with_retries_async(fn, tokens=0, max_retries=MAX_RETRIES):
+    """Async counterpart of call_with_retries; `fn()` returns an awaitable."""
+    attempt = 0
+    backoff = 0.0
+    while True:
+        await asyncio.sleep(max(backoff, _throttle_delay(tokens)))
+        stats.add('requests')
+        try:
+            return await fn()
+        except Exception as e:
+            backoff = _on_error(e, attempt, max_retries)
+            attempt += 1
+
+
+def _limits():
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+
+
+def make_client(api_key, base_url=BASE_URL):
+    """Sync client on a pooled HTTP client. Retries are ours, so the SDK's are off."""
+    return OpenAI(
+        api_key=api_key, base_url=base_url, max_retries=0,
+        http_client=httpx.Client(limits=_limits(), timeout=REQUEST_TIMEOUT_SECONDS),
+    )
+
+
+_async_clients = weakref.WeakKeyDictionary()
+_async_client_users = {}  # loop -> open async_client_session() scopes on it
+_async_clients_lock = threading.Lock()
+
+
+def get_async_client(api_key, base_url=BASE_URL):
+    """Async client for the running event loop; calls within one loop share its connection pool."""
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key, base_url=base_url, max_retries=0,
+                http_client=httpx.AsyncClient(limits=_limits(), timeout=REQUEST_TIMEOUT_SECONDS),
+            )
+            _async_clients[loop] = client
+    return client
+
+
+@contextlib.asynccontextmanager
+async def async_client_session():
+    """Scope of async client use on the running loop; the last scope to exit closes the client.
+
+    Without this every asyncio.run would leave an open client (and its sockets) behind.
+    Concurrent scopes on one loop share the client, so one finishing never closes it under another.
+    """
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        _async_client_users[loop] = _async_client_users.get(loop, 0) + 1
+    try:
+        yield
+    finally:
+        with _async_clients_lock:
+            _async_client_users[loop] -= 1
+            client = None
+            if not _async_client_users[loop]:
+                del _async_client_users[loop]
+                client = _async_clients.pop(loop, None)
+        if client is not None:
+            await client.close()
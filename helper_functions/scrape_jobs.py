@@ -0,0 +1,368 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import asyncio
+import subprocess
+import pandas as pd
+from helper_functions import scraper
+from helper_functions import scrape_state
+from helper_functions import sharded_scraper
+from helper_functions.url_canonical import canonicalize_url
+
+# Background scrape jobs.
+# The admin page only submits a job and polls its state; a separate worker
+# process (python -m helper_functions.scrape_jobs worker) does the scraping.
+# Job state lives in SQLite, results are appended to a JSONL file per job as
+# each batch of URLs completes, so a job survives the page being closed and can
+# be cancelled and later resumed from the last completed batch.
+# Only one worker owns the queue at a time (a lease in the worker table, renewed
+# by its heartbeat), and a job only resumes against the same input CSV it
+# started from, since results are stored by row position.
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+JOBS_DB = os.path.join(ROOT_DIR, 'data', 'cache', 'scrape_jobs.sqlite')
+RESULTS_DIR = os.path.join(ROOT_DIR, 'data', 'cache', 'scrape_jobs')
+BATCH_SIZE = 32
+# With workers > 1 every batch starts that many browser processes, so batches are bigger
+SHARDED_BATCH_SIZE = 256
+POLL_SECONDS = 1.0
+HEARTBEAT_TIMEOUT_SECONDS = 120
+WORKER_IDLE_EXIT_SECONDS = 300
+
+ACTIVE_STATUSES = ('queued', 'running', 'cancelling')
+
+
+class InputChangedError(RuntimeError):
+    pass
+
+
+class WorkerLeaseLost(RuntimeError):
+    pass
+
+
+def _connect(path=JOBS_DB):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS jobs ('
+        ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+        ' status TEXT NOT NULL,'
+        ' csv_path TEXT NOT NULL,'
+        ' output_csv TEXT NOT NULL,'
+        ' options TEXT NOT NULL,'
+        ' total INTEGER NOT NULL DEFAULT 0,'
+        ' done INTEGER NOT NULL DEFAULT 0,'
+        ' summary TEXT,'
+        ' error TEXT,'
+        ' created_at REAL NOT NULL,'
+        ' started_at REAL,'
+        ' finished_at REAL,'
+        ' updated_at REAL,'
+        ' input_hash TEXT)'
+    )
+    # Job tables created before input hashes were stored
+    if 'input_hash' not in {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}:
+        conn.execute('ALTER TABLE jobs ADD COLUMN input_hash TEXT')
+    conn.execute('CREATE TABLE IF NOT EXISTS worker (id INTEGER PRIMARY KEY CHECK (id = 1), pid INTEGER, heartbeat REAL)')
+    return conn
+
+
+def results_path(job_id):
+    return os.path.join(RESULTS_DIR, f'job_{job_id}.jsonl')
+
+
+def file_hash(path):
+    """sha256 of the file's bytes, or None if it cannot be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+# ---------------------------
+# API used by the admin page
+# ---------------------------
+def submit_job(csv_path, output_csv, **options):
+    """Queue a scrape of every URL in `csv_path`; returns the job id.
+
+    `options` go to check_links_incremental, except `workers`: above 1, every
+    URL is loaded in a browser, sharded across that many processes.
+    """
+    with _connect() as conn:
+        cursor = conn.execute(
+            'INSERT INTO jobs (status, csv_path, output_csv, options, created_at, updated_at, input_hash)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ('queued', csv_path, output_csv, json.dumps(options), time.time(), time.time(), file_hash(csv_path)),
+        )
+        job_id = cursor.lastrowid
+    ensure_worker()
+    return job_id
+
+
+def get_job(job_id):
+    with _connect() as conn:
+        row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    return _job_dict(row) if row else None
+
+
+def list_jobs(limit=20):
+    with _connect() as conn:
+        rows = conn.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    return [_job_dict(row) for row in rows]
+
+
+def cancel_job(job_id):
+    """Ask the worker to stop after the batch in progress. Queued jobs are cancelled at once."""
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ?"
+                     " WHERE id = ? AND status = 'queued'", (time.time(), time.time(), job_id))
+        conn.execute("UPDATE jobs SET status = 'cancelling', updated_at = ?"
+                     " WHERE id = ? AND status = 'running'", (time.time(), job_id))
+
+
+def resume_job(job_id):
+    """Re-queue a cancelled or failed job; URLs already in its results file are skipped.
+
+    Returns False, leaving the job as it is, if its input CSV has changed since
+    the job started: the stored results would no longer line up with its rows.
+    """
+    job = get_job(job_id)
+    if job is None or _input_changed(job):
+        return False
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET status = 'queued', error = NULL, finished_at = NULL, updated_at = ?"
+                     " WHERE id = ? AND status IN ('cancelled', 'failed')", (time.time(), job_id))
+    ensure_worker()
+    return True
+
+
+def read_results(job_id):
+    """Results streamed so far, in input order."""
+    return [result for _, result in sorted(_completed_results(job_id).items())]
+
+
+def _job_dict(row):
+    job = dict(row)
+    job['options'] = json.loads(job['options'])
+    job['summary'] = json.loads(job['summary']) if job['summary'] else None
+    job['progress'] = job['done'] / job['total'] if job['total'] else 0.0
+    return job
+
+
+def worker_alive():
+    with _connect() as conn:
+        row = conn.execute('SELECT pid, heartbeat FROM worker WHERE id = 1').fetchone()
+    return bool(row and row['heartbeat'] and time.time() - row['heartbeat'] < HEARTBEAT_TIMEOUT_SECONDS)
+
+
+def ensure_worker():
+    """Start the worker process if none is running. It is detached from the Streamlit process."""
+    if worker_alive():
+        return
+    kwargs = {}
+    if sys.platform == 'win32':
+        kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+    else:
+        kwargs['start_new_session'] = True
+    subprocess.Popen(
+        [sys.executable, '-m', 'helper_functions.scrape_jobs', 'worker'],
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs
+    )
+
+
+# ------------
+# Worker side
+# ------------
+def _completed_results(job_id):
+    """{input position: result} from the job's results file."""
+    completed = {}
+    path = results_path(job_id)
+    if not os.path.exists(path):
+        return completed
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a torn last line from a crash; that URL is simply redone
+            completed[record['position']] = record['result']
+    return completed
+
+
+def _input_changed(job, input_hash=None):
+    """True if the job has results from a different version of its input CSV."""
+    input_hash = input_hash or file_hash(job['csv_path'])
+    return bool(job['input_hash'] and job['input_hash'] != input_hash and os.path.exists(results_path(job['id'])))
+
+
+def _claim_next_job(conn):
+    conn.execute('BEGIN IMMEDIATE')
+    row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+    if row is None:
+        conn.execute('COMMIT')
+        return None
+    conn.execute("UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?), updated_at = ?"
+                 " WHERE id = ?", (time.time(), time.time(), row['id']))
+    conn.execute('COMMIT')
+    return row['id']
+
+
+def _acquire_lease(conn):
+    """Become the queue's worker unless a live one already is. Returns True on success."""
+    conn.execute('BEGIN IMMEDIATE')
+    row = conn.execute('SELECT pid, heartbeat FROM worker WHERE id = 1').fetchone()
+    if row and row['pid'] != os.getpid() and row['heartbeat'] \
+            and time.time() - row['heartbeat'] < HEARTBEAT_TIMEOUT_SECONDS:
+        conn.execute('COMMIT')
+        return False
+    conn.execute('INSERT OR REPLACE INTO worker (id, pid, heartbeat) VALUES (1, ?, ?)', (os.getpid(), time.time()))
+    # The previous owner is gone, so its running jobs are picked up again (and resume)
+    conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+    conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE status = 'cancelling'", (time.time(),))
+    conn.execute('COMMIT')
+    return True
+
+
+def _heartbeat(conn):
+    """Renew our lease; False if another worker has taken it over."""
+    cursor = conn.execute('UPDATE worker SET heartbeat = ? WHERE id = 1 AND pid = ?', (time.time(), os.getpid()))
+    return cursor.rowcount == 1
+
+
+def _status(conn, job_id):
+    return conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()['status']
+
+
+def _row_result(result, i, urls, titles):
+    """`result` as the record for input row `i`."""
+    result = dict(result, URL=urls[i])
+    if titles is not None:
+        result.pop('Course Title', None)
+        result = {'Course Title': titles[i], **result}
+    return result
+
+
+def run_job(conn, job_id):
+    job = _job_dict(conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+    options = dict(job['options'])
+    workers = int(options.pop('workers', 1) or 1)
+    batch_size = SHARDED_BATCH_SIZE if workers > 1 else BATCH_SIZE
+    input_hash = file_hash(job['csv_path'])
+    if _input_changed(job, input_hash):
+        raise InputChangedError(f"{job['csv_path']} has changed since this job started; submit a new job")
+    conn.execute('UPDATE jobs SET input_hash = ? WHERE id = ?', (input_hash, job_id))
+
+    titles, urls = scraper.read_course_urls(job['csv_path'])
+    completed = _completed_results(job_id)
+    keys = [canonicalize_url(u) for u in urls]
+    # Rows still to do, grouped by canonical URL: each URL is fetched once per job
+    positions = {}
+    for i in range(len(urls)):
+        if i not in completed:
+            positions.setdefault(keys[i], []).append(i)
+    done_by_key = {keys[i]: result for i, result in completed.items()}
+    pending = [key for key in positions if key not in done_by_key]
+    done = len(completed)
+    conn.execute('UPDATE jobs SET total = ?, done = ?, updated_at = ? WHERE id = ?',
+                 (len(urls), done, time.time(), job_id))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    state = scrape_state.ScrapeState()
+    try:
+        with open(results_path(job_id), 'a', encoding='utf-8') as out:
+            def write(key, result):
+                for i in positions[key]:
+                    out.write(json.dumps({'position': i, 'result': _row_result(result, i, urls, titles)}) + '\n')
+                return len(positions[key])
+
+            # Rows whose URL was already scraped earlier in this job (under another spelling)
+            for key in positions:
+                if key in done_by_key:
+                    done += write(key, done_by_key[key])
+            out.flush()
+
+            for start in range(0, len(pending), batch_size):
+                if _status(conn, job_id) == 'cancelling':
+                    conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ? WHERE id = ?",
+                                 (time.time(), time.time(), job_id))
+                    return
+                batch = pending[start:start + batch_size]
+                batch_rows = sum(len(positions[key]) for key in batch)
+                done_before = done
+
+                def on_progress(fraction):
+                    conn.execute('UPDATE jobs SET done = ?, updated_at = ? WHERE id = ?',
+                                 (done_before + int(fraction * batch_rows), time.time(), job_id))
+                    _heartbeat(conn)
+
+                batch_urls = [urls[positions[key][0]] for key in batch]
+                if workers > 1:
+                    # Full browser loads with no stored state to compare against
+                    results = [dict(result, change='scraped') for result in sharded_scraper.scrape_urls_sharded(
+                        batch_urls, workers=workers, progress_callback=on_progress,
+                        profile=options.get('profile', 'link-check'),
+                    )]
+                else:
+                    results, _ = asyncio.run(scrape_state.check_links_incremental(
+                        batch_urls, progress_callback=on_progress, state=state, **options
+                    ))
+                # Stream finished results to disk right away
+                for key, result in zip(batch, results):
+                    done += write(key, result)
+                out.flush()
+                conn.execute('UPDATE jobs SET done = ?, updated_at = ? WHERE id = ?', (done, time.time(), job_id))
+                if not _heartbeat(conn):
+                    raise WorkerLeaseLost()
+
+        results = read_results(job_id)
+        pd.DataFrame(results).to_csv(job['output_csv'], index=False)
+        summary = {'total': len(results)}
+        if workers > 1:
+            summary['workers'] = workers
+        for result in results:
+            summary[result.get('change', 'unknown')] = summary.get(result.get('change', 'unknown'), 0) + 1
+        conn.execute("UPDATE jobs SET status = 'completed', summary = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                     (json.dumps(summary), time.time(), time.time(), job_id))
+    finally:
+        state.close()
+
+
+def worker_loop():
+    conn = _connect()
+    if not _acquire_lease(conn):
+        return  # another worker already owns the queue
+    idle_since = time.time()
+    while True:
+        if not _heartbeat(conn):
+            return  # our lease lapsed and another worker took over
+        job_id = _claim_next_job(conn)
+        if job_id is None:
+            if time.time() - idle_since > WORKER_IDLE_EXIT_SECONDS:
+                conn.execute('DELETE FROM worker WHERE id = 1 AND pid = ?', (os.getpid(),))
+                return
+            time.sleep(POLL_SECONDS)
+            continue
+        try:
+            run_job(conn, job_id)
+        except WorkerLeaseLost:
+            return  # the new owner has re-queued this job
+        except Exception as e:
+            conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                         (str(e) if isinstance(e, InputChangedError) else repr(e), time.time(), time.time(), job_id))
+        idle_since = time.time()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['worker']:
+        worker_loop()
+    else:
+        print("usage: python -m helper_functions.scrape_jobs worker")
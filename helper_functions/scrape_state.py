@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from helper_functions.link_checker import check_links
+from helper_functions.url_canonical import canonicalize_url
+
+# Persistent per-URL scrape state, so "Scrape" only re-fetches what needs it.
+# Each canonical URL keeps its last result, when it was fetched, the
+# ETag / Last-Modified validators, a content hash, status and latency.
+# URLs checked within the freshness window are reused as-is, stale ones get
+# a conditional request, and failed ones are always retried.
+
+DEFAULT_PATH = './data/cache/scrape_state.sqlite'
+DEFAULT_FRESHNESS_SECONDS = 24 * 60 * 60
+
+
+def is_failure(result):
+    status = result.get('status_code')
+    return result.get('title') == 'Error' or status is None or status >= 400
+
+
+class ScrapeState:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS scrape_state ('
+            ' url TEXT PRIMARY KEY,'
+            ' last_fetched REAL NOT NULL,'
+            ' etag TEXT,'
+            ' last_modified TEXT,'
+            ' content_hash TEXT,'
+            ' status_code INTEGER,'
+            ' latency_ms REAL,'
+            ' result TEXT NOT NULL)'
+        )
+        self._conn.commit()
+
+    def get_many(self, urls):
+        """Return {canonical url: row dict} for the URLs we have state for."""
+        keys = list(dict.fromkeys(urls))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    'SELECT url, last_fetched, etag, last_modified, content_hash, status_code, latency_ms, result'
+                    f' FROM scrape_state WHERE url IN ({placeholders})', chunk
+                ).fetchall()
+                for url, fetched, etag, modified, content_hash, status, latency, result in rows:
+                    found[url] = {
+                        'last_fetched': fetched,
+                        'etag': etag,
+                        'last_modified': modified,
+                        'content_hash': content_hash,
+                        'status_code': status,
+                        'latency_ms': latency,
+                        'result': json.loads(result),
+                    }
+        return found
+
+    def put_many(self, rows):
+        """Store an iterable of (canonical url, result, validators, fetched_at)."""
+        values = [
+            (url, fetched_at, validators.get('etag'), validators.get('last_modified'),
+             validators.get('content_hash'), result.get('status_code'), result.get('latency_ms'),
+             json.dumps(result))
+            for url, result, validators, fetched_at in rows
+        ]
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO scrape_state'
+                ' (url, last_fetched, etag, last_modified, content_hash, status_code, latency_ms, result)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)', values
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+async def check_links_incremental(urls, progress_callback=None, state=None,
+                                  freshness_seconds=DEFAULT_FRESHNESS_SECONDS, force=False, **browser_options):
+    """check_links, but reusing the persisted state wherever it is still good.
+
+    URLs are canonicalised first (tracking parameters stripped, encoding
+    normalised) and each canonical URL is requested at most once; its result
+    is fanned out to every input that maps to it.
+    Every result gains "canonical_url" and a "change" field: fresh (reused
+    without a request), unchanged (304 or same content), changed, new, or failed.
+    Returns (results in input order, summary counts).
+    """
+    urls = list(urls)
+    own_state = state is None
+    state = state or ScrapeState()
+    now = time.time()
+    keys = [canonicalize_url(u) for u in urls]
+    known = state.get_many(keys)
+
+    results = [None] * len(urls)
+    to_fetch = []           # indexes into urls
+    for i, key in enumerate(keys):
+        entry = known.get(key)
+        if (not force and entry and now - entry['last_fetched'] < freshness_seconds
+                and not is_failure(entry['result'])):
+            results[i] = dict(entry['result'], URL=urls[i], canonical_url=key, change='fresh')
+        else:
+            to_fetch.append(i)
+
+    # One request per canonical URL, even if the CSV lists it several times
+    fetch_keys = list(dict.fromkeys(keys[i] for i in to_fetch))
+    fetch_urls = fetch_keys
+    validators = []
+    for key in fetch_keys:
+        entry = known.get(key)
+        usable = entry and not force and not is_failure(entry['result'])
+        validators.append({'etag': entry['etag'], 'last_modified': entry['last_modified']} if usable else None)
+
+    reused = len(urls) - len(to_fetch)
+
+    def on_progress(fraction):
+        if progress_callback:
+            progress_callback((reused + fraction * len(to_fetch)) / len(urls))
+
+    fetched = await check_links(fetch_urls, progress_callback=on_progress, validators=validators,
+                                keep_validators=True, **browser_options) if fetch_urls else []
+
+    by_key = {}
+    rows = []
+    for key, result in zip(fetch_keys, fetched):
+        entry = known.get(key)
+        result_validators = result.pop('_validators', None) or {}
+        if result.get('status_code') == 304 and entry:
+            # Not modified: keep the stored title/snippet, refresh validators and time
+            merged = dict(entry['result'], latency_ms=result.get('latency_ms'))
+            result_validators = {
+                'etag': result_validators.get('etag') or entry['etag'],
+                'last_modified': result_validators.get('last_modified') or entry['last_modified'],
+                'content_hash': entry['content_hash'],
+            }
+            change = 'unchanged'
+            result = merged
+        elif is_failure(result):
+            change = 'failed'
+        elif entry is None:
+            change = 'new'
+        elif result_validators.get('content_hash') and result_validators['content_hash'] == entry['content_hash']:
+            change = 'unchanged'
+        else:
+            change = 'changed'
+        rows.append((key, result, result_validators, now))
+        by_key[key] = (result, change)
+    state.put_many(rows)
+
+    for i in to_fetch:
+        result, change = by_key[keys[i]]
+        results[i] = dict(result, URL=urls[i], canonical_url=keys[i], change=change)
+
+    if progress_callback and urls:
+        progress_callback(1.0)
+    if own_state:
+        state.close()
+
+    summary = {
+        'total': len(urls),
+        'unique_urls': len(set(keys)),
+        'fetches_saved_by_dedup': len(to_fetch) - len(fetch_urls),
+        'requests': len(fetch_urls),
+    }
+    for result in results:
+        summary[result['change']] = summary.get(result['change'], 0) + 1
+    return results, summary
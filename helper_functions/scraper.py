@@ -2,49 +2,237 @@ import nest_asyncio
 import asyncio
 import pandas as pd
 import sys
+import time
+from urllib.parse import urlsplit
 from playwright.async_api import async_playwright
+from helper_functions import extractors
 
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 nest_asyncio.apply()  # allows nested event loops, useful if needed
 
-async def scrape_url_data(urls, progress_callback=None):
-    results = []
+# Concurrency defaults: pages open at once, browser contexts they are spread
+# over, and pages allowed on a single host at a time (be gentle with
+# learn.gov.sg / isca.org.sg).
+DEFAULT_CONCURRENCY = 8
+DEFAULT_CONTEXTS = 2
+DEFAULT_PER_HOST_LIMIT = 3
+PAGE_TIMEOUT_MS = 30000
+
+
+# Fetch profiles for the browser.
+#   "full"       - today's behaviour: wait for `load`, download everything, read the whole body
+#   "link-check" - block heavy resources and trackers, stop at DOMContentLoaded and
+#                  cut the snippet inside the page so only ~300 chars cross the CDP boundary
+#   "extract"    - link-check, plus the per-domain extractor (helper_functions.extractors)
+#                  for cost / dates / duration, run in the page
+TRACKER_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "facebook.net", "hotjar.com", "clarity.ms",
+)
+FETCH_PROFILES = {
+    "full": {
+        "wait_until": "load",
+        "block_resource_types": set(),
+        "block_hosts": (),
+        "extract": False,
+    },
+    "link-check": {
+        "wait_until": "domcontentloaded",
+        "block_resource_types": {"image", "media", "font", "stylesheet"},
+        "block_hosts": TRACKER_HOSTS,
+        "extract": False,
+    },
+    "extract": {
+        "wait_until": "domcontentloaded",
+        "block_resource_types": {"image", "media", "font", "stylesheet"},
+        "block_hosts": TRACKER_HOSTS,
+        "extract": True,
+    },
+}
+DEFAULT_PROFILE = "full"
+SNIPPET_LENGTH = 300
+SNIPPET_SCRIPT = """(n) => {
+    const text = document.body ? document.body.textContent || '' : '';
+    return text.replace(/\\s+/g, ' ').trim().slice(0, n);
+}"""
+
+
+def url_host(url):
+    return urlsplit(url).netloc.lower()
+
+
+async def _apply_profile(context, profile):
+    settings = FETCH_PROFILES[profile]
+    if not settings["block_resource_types"] and not settings["block_hosts"]:
+        return
+
+    async def handle(route):
+        request = route.request
+        host = url_host(request.url)
+        if request.resource_type in settings["block_resource_types"] or host.endswith(settings["block_hosts"]):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle)
+
+
+async def _scrape_page(page, url, profile=DEFAULT_PROFILE):
+    finished = []
+    on_finished = finished.append
+    page.on("requestfinished", on_finished)
+    start = time.perf_counter()
+    try:
+        result = await _load_page(page, url, profile)
+    finally:
+        page.remove_listener("requestfinished", on_finished)
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    result["bytes_transferred"] = await _transferred_bytes(finished)
+    result["profile"] = profile
+    return result
+
+
+async def _transferred_bytes(requests):
+    sizes = await asyncio.gather(*(r.sizes() for r in requests), return_exceptions=True)
+    return sum(
+        s["responseBodySize"] + s["responseHeadersSize"]
+        for s in sizes if isinstance(s, dict)
+    )
+
+
+async def _load_page(page, url, profile=DEFAULT_PROFILE):
+    settings = FETCH_PROFILES[profile]
+    try:
+        load_start = time.perf_counter()
+        response = await page.goto(url, timeout=PAGE_TIMEOUT_MS, wait_until=settings["wait_until"])
+        load_ms = round((time.perf_counter() - load_start) * 1000, 1)
+        title = await page.title()
+        if profile == "full":
+            body = await page.text_content("body")
+            snippet = (body or "").strip().replace('\n', ' ')[:SNIPPET_LENGTH]
+        else:
+            snippet = await page.evaluate(SNIPPET_SCRIPT, SNIPPET_LENGTH)
+        result = {
+            "URL": url,
+            "title": title,
+            "snippet": snippet,
+            "status_code": response.status if response else None,
+            "final_url": page.url,
+            "load_ms": load_ms,
+        }
+        if settings["extract"]:
+            result["extracted"] = await extractors.extractor_for(page.url).extract(page)
+        return result
+    except Exception as e:
+        return {
+            "URL": url,
+            "title": "Error",
+            "snippet": str(e),
+            "status_code": None,
+            "final_url": url,
+            "load_ms": None,
+        }
+
+
+async def scrape_url_data(urls, progress_callback=None, concurrency=DEFAULT_CONCURRENCY,
+                          contexts=DEFAULT_CONTEXTS, per_host_limit=DEFAULT_PER_HOST_LIMIT,
+                          profile=DEFAULT_PROFILE):
+    """Scrape `urls` with a pool of pages. Results come back in input order.
+
+    `profile` is a key of FETCH_PROFILES; every result records its load time
+    and the bytes transferred for the page and its sub-resources.
+    """
+    if profile not in FETCH_PROFILES:
+        raise ValueError(f"Unknown fetch profile: {profile}")
+    urls = list(urls)
     total = len(urls)
+    results = [None] * total
+    if not urls:
+        return results
+    concurrency = max(1, min(concurrency, total))
+    contexts = max(1, min(contexts, concurrency))
+
+    host_limits = {}
+    done = 0
+
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-
-        for i, url in enumerate(urls):
-            try:
-                await page.goto(url, timeout=30000)
-                title = await page.title()
-                body = await page.text_content("body")
-                snippet = (body or "").strip().replace('\n', ' ')[:300]
-                results.append({
-                    "URL": url,
-                    "title": title,
-                    "snippet": snippet
-                })
-            except Exception as e:
-                results.append({
-                    "URL": url,
-                    "title": "Error",
-                    "snippet": str(e)
-                })
+        browser_contexts = [await browser.new_context() for _ in range(contexts)]
+        for context in browser_contexts:
+            await _apply_profile(context, profile)
+
+        # Page pool: taking a page from the queue is what bounds concurrency
+        pages = asyncio.Queue()
+        for i in range(concurrency):
+            await pages.put(await browser_contexts[i % contexts].new_page())
 
+        async def worker(i, url):
+            nonlocal done
+            host = url_host(url)
+            if host not in host_limits:
+                host_limits[host] = asyncio.Semaphore(per_host_limit)
+            # Wait for the host slot before taking a page, so a busy host never holds pages idle
+            async with host_limits[host]:
+                page = await pages.get()
+                try:
+                    results[i] = await _scrape_page(page, url, profile)
+                finally:
+                    pages.put_nowait(page)
+            done += 1
             if progress_callback:
-                progress_callback((i + 1) / total)  # update progress
+                progress_callback(done / total)  # update progress
 
+        await asyncio.gather(*(worker(i, url) for i, url in enumerate(urls)))
+
+        for context in browser_contexts:
+            await context.close()
         await browser.close()
     return results
 
-def scrape_from_csv(file_path, progress_callback=None):
-    # Read URLs from csv
+def read_course_urls(file_path):
+    """(course titles, urls) for every row of the CSV that has a URL."""
     df = pd.read_csv(file_path)
-    urls = df['URL'].dropna().tolist()  # get url column, remove empty
-    # Run async scraping
-    scraped_data = asyncio.run(scrape_url_data(urls, progress_callback=progress_callback))
+    df.columns = df.columns.str.strip()
+    df = df[df['URL'].notna() & (df['URL'].astype(str).str.strip() != '')]  # remove empty
+    urls = df['URL'].astype(str).str.strip().tolist()
+    titles = df['Course Title'].astype(str).str.strip().tolist() if 'Course Title' in df.columns else None
+    return titles, urls
+
+
+def scrape_from_csv(file_path, progress_callback=None, freshness_seconds=None, force=False,
+                    profile="link-check", workers=1):
+    """Check every URL in the CSV, re-fetching only what is stale, changed or failed.
+
+    With workers > 1 every unique URL is instead loaded in a browser, sharded
+    across that many processes (see sharded_scraper).
+    Returns (DataFrame of results, summary counts).
+    """
+    # Imported here because link_checker / scrape_state build on this module
+    from helper_functions import scrape_state
+    # Read URLs from csv
+    titles, urls = read_course_urls(file_path)
+    if workers > 1:
+        from helper_functions.sharded_scraper import scrape_urls_sharded
+        scraped_df = pd.DataFrame(scrape_urls_sharded(
+            urls, workers=workers, progress_callback=progress_callback, profile=profile
+        ))
+        if titles is not None:
+            scraped_df.insert(0, 'Course Title', titles)
+        summary = {'total': len(urls), 'unique_urls': scraped_df['canonical_url'].nunique() if len(urls) else 0,
+                   'workers': workers}
+        return scraped_df, summary
+    if freshness_seconds is None:
+        freshness_seconds = scrape_state.DEFAULT_FRESHNESS_SECONDS
+    # Run async link check (plain HTTP first, browser only where needed).
+    # Duplicate URLs are fetched once and the result is copied to every row using them.
+    scraped_data, summary = asyncio.run(scrape_state.check_links_incremental(
+        urls, progress_callback=progress_callback, freshness_seconds=freshness_seconds, force=force,
+        profile=profile,
+    ))
     # Return scraped data as DataFrame for easier use later
-    return pd.DataFrame(scraped_data)
\ No newline at end of file
+    scraped_df = pd.DataFrame(scraped_data)
+    if titles is not None:
+        scraped_df.insert(0, 'Course Title', titles)
+    return scraped_df, summary
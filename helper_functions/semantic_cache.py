@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Semantic answer cache.
+# Paraphrases of an already answered question ("internal audit beginner courses"
+# vs "foundation courses for internal audit") get the stored reply instead of a
+# new pipeline run. Queries are compared by cosine similarity of their
+# embeddings against an in-memory table; entries expire after a TTL, the least
+# recently used entry is evicted at the size cap, and everything is dropped
+# when the catalog version changes.
+
+DEFAULT_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92'))
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+
+
+class SemanticCache:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = None
+        self._vectors = None                # (max_entries, dim) float32, rows are unit vectors
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._entries = OrderedDict()       # slot -> entry dict, least recently used first
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _reset(self, version):
+        self.version = version
+        self._valid[:] = False
+        self._entries.clear()
+        self._free = list(range(self.max_entries - 1, -1, -1))
+
+    def _drop(self, slot):
+        self._valid[slot] = False
+        del self._entries[slot]
+        self._free.append(slot)
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, vector, version):
+        """(entry, similarity) for the closest cached query above the threshold, else None."""
+        query = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            if version != self.version:
+                self._reset(version)
+            if self._vectors is None or not self._entries or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            scores = self._vectors @ query
+            scores[~self._valid] = -1.0
+            slot = int(np.argmax(scores))
+            similarity = float(scores[slot])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            entry = self._entries[slot]
+            if now - entry['created_at'] > self.ttl_seconds:
+                self._drop(slot)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return entry, similarity
+
+    def put(self, vector, version, query, reply, course_details):
+        vector = self._unit(vector)
+        with self._lock:
+            if version != self.version:
+                self._reset(version)
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._reset(version)
+            if not self._free:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = {
+                'query': query,
+                'reply': reply,
+                'course_details': course_details,
+                'created_at': time.time(),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._reset(self.version)
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': entries,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide semantic cache shared by all sessions."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache()
+    return _cache
@@ -0,0 +1,125 @@
+import queue
+import asyncio
+import multiprocessing
+from playwright.async_api import async_playwright
+from helper_functions import scraper
+from helper_functions.url_canonical import group_by_canonical
+
+# Multi-process browser scraping.
+# One Chromium driven from one event loop tops out at about one core, so this
+# mode spreads the (de-duplicated) URLs over N worker processes, each owning
+# its own browser and page pool. Every worker starts with its own shard and,
+# once that is empty, steals from the other shards, so a shard full of slow
+# hosts does not leave the other workers idle. Results are merged back into
+# input order by the parent.
+
+QUEUE_TIMEOUT_SECONDS = 0.1
+# Per-host limits are per worker, so keep them lower than the single-process default
+WORKER_PER_HOST_LIMIT = 2
+
+
+def _next_item(worker_id, shards):
+    """Take from our own shard first, then steal from the others."""
+    order = [worker_id] + [i for i in range(len(shards)) if i != worker_id]
+    for i in order:
+        try:
+            return shards[i].get(timeout=QUEUE_TIMEOUT_SECONDS)
+        except queue.Empty:
+            continue
+    return None
+
+
+async def _worker_async(worker_id, shards, results, concurrency, contexts, per_host_limit, profile):
+    host_limits = {}
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        browser_contexts = [await browser.new_context() for _ in range(contexts)]
+        for context in browser_contexts:
+            await scraper._apply_profile(context, profile)
+        pages = [await browser_contexts[i % contexts].new_page() for i in range(concurrency)]
+
+        async def runner(page):
+            loop = asyncio.get_running_loop()
+            while True:
+                # Queue reads block briefly, so keep them off the event loop
+                item = await loop.run_in_executor(None, _next_item, worker_id, shards)
+                if item is None:
+                    return
+                position, url = item
+                host = scraper.url_host(url)
+                if host not in host_limits:
+                    host_limits[host] = asyncio.Semaphore(per_host_limit)
+                async with host_limits[host]:
+                    result = await scraper._scrape_page(page, url, profile)
+                result['worker'] = worker_id
+                results.put((position, result))
+
+        await asyncio.gather(*(runner(page) for page in pages))
+        for context in browser_contexts:
+            await context.close()
+        await browser.close()
+
+
+def _worker_main(worker_id, shards, results, concurrency, contexts, per_host_limit, profile):
+    asyncio.run(_worker_async(worker_id, shards, results, concurrency, contexts, per_host_limit, profile))
+
+
+def scrape_urls_sharded(urls, workers=2, progress_callback=None, concurrency=scraper.DEFAULT_CONCURRENCY,
+                        contexts=scraper.DEFAULT_CONTEXTS, per_host_limit=WORKER_PER_HOST_LIMIT,
+                        profile="link-check"):
+    """Scrape `urls` across `workers` processes. Returns results in input order.
+
+    Duplicate URLs (after canonicalisation) are loaded once and the result is
+    copied to every position that referenced them.
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+    canonical, groups = group_by_canonical(urls)
+    unique = list(groups)
+    workers = max(1, min(workers, len(unique)))
+
+    # spawn: safe to use from a threaded Streamlit process and the same on every OS
+    ctx = multiprocessing.get_context('spawn')
+    shards = [ctx.Queue() for _ in range(workers)]
+    results = ctx.Queue()
+    for i, url in enumerate(unique):
+        shards[i % workers].put((i, url))
+
+    processes = [
+        ctx.Process(target=_worker_main,
+                    args=(w, shards, results, concurrency, contexts, per_host_limit, profile),
+                    daemon=True)
+        for w in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    unique_results = [None] * len(unique)
+    received = 0
+    while received < len(unique):
+        try:
+            position, result = results.get(timeout=1.0)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break  # every worker exited (or crashed); fill in the gaps below
+            continue
+        unique_results[position] = result
+        received += 1
+        if progress_callback:
+            progress_callback(received / len(unique))
+
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+    position_of = {key: i for i, key in enumerate(unique)}
+    merged = []
+    for url, key in zip(urls, canonical):
+        result = unique_results[position_of[key]]
+        if result is None:
+            result = {"URL": url, "title": "Error", "snippet": "Worker exited before scraping this URL",
+                      "status_code": None, "final_url": url}
+        merged.append(dict(result, URL=url, canonical_url=key))
+    return merged
@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import uuid
+import logging
+import contextvars
+import threading
+from logging.handlers import RotatingFileHandler
+
+# Lightweight tracing for chat turns.
+# A turn is one trace; stages inside it are spans, and every LLM call made while
+# the trace is active is recorded with its token counts and estimated cost. The
+# finished trace is appended as one JSON line to a rotating file, which the admin
+# metrics page reads. The current trace lives in a ContextVar, so asyncio tasks
+# see it automatically; work handed to threads must go through run_in_context().
+# With LLM_TRACING=0, span() and record_llm_call() return after one lookup.
+
+TRACING_ENABLED = os.getenv('LLM_TRACING', '1') == '1'
+TRACE_DIR = './data/cache/traces'
+TRACE_FILE = 'traces.jsonl'
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+
+# USD per 1M tokens: (prompt, completion). Unknown models are costed at 0.
+MODEL_PRICES = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'text-embedding-3-small': (0.02, 0.0),
+    'text-embedding-3-large': (0.13, 0.0),
+    'omni-moderation-latest': (0.0, 0.0),
+}
+
+_current = contextvars.ContextVar('current_trace', default=None)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class Trace:
+    def __init__(self, name, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans = []
+        self.llm_calls = []
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self):
+        return {
+            'trace_id': self.id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'duration_ms': round(self.elapsed_ms(), 1),
+            'attrs': self.attrs,
+            'spans': self.spans,
+            'llm_calls': self.llm_calls,
+            'prompt_tokens': sum(c['prompt_tokens'] for c in self.llm_calls),
+            'completion_tokens': sum(c['completion_tokens'] for c in self.llm_calls),
+            'cost_usd': round(sum(c['cost_usd'] for c in self.llm_calls), 6),
+        }
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'attrs', 'start')
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        span = {
+            'name': self.name,
+            'start_ms': round((self.start - self.trace._start) * 1000, 1),
+            'duration_ms': round((end - self.start) * 1000, 1),
+        }
+        if self.attrs:
+            span['attrs'] = self.attrs
+        if exc_type is not None:
+            span['error'] = exc_type.__name__
+        self.trace.spans.append(span)  # list.append is atomic, spans may end on any thread
+        return False
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **attrs):
+    """Context manager timing one stage of the current trace (a no-op outside a trace)."""
+    trace = _current.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name, attrs)
+
+
+def record_llm_call(kind, model, prompt_tokens=0, completion_tokens=0, duration_ms=None, cached=False):
+    trace = _current.get()
+    if trace is None:
+        return
+    trace.llm_calls.append({
+        'kind': kind,
+        'model': model,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'cost_usd': round(estimate_cost(model, prompt_tokens, completion_tokens), 6),
+        'duration_ms': None if duration_ms is None else round(duration_ms, 1),
+        'cached': cached,
+    })
+
+
+def run_in_context(fn, *args):
+    """Callable for run_in_executor that runs `fn(*args)` inside the caller's trace."""
+    context = contextvars.copy_context()
+    return lambda: context.run(fn, *args)
+
+
+class start_trace:
+    """Context manager for one traced unit of work; writes the trace on exit."""
+
+    def __init__(self, name, **attrs):
+        self.trace = Trace(name, **attrs) if TRACING_ENABLED else None
+        self._token = None
+
+    def __enter__(self):
+        if self.trace is not None:
+            self._token = _current.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is None:
+            return False
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.trace.attrs['error'] = exc_type.__name__
+        write_trace(self.trace)
+        return False
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def _get_logger():
+    """Process-wide logger writing to the rotating trace file."""
+    global _logger
+    if _logger is not None:
+        return _logger
+    # Two first turns at once must not each attach a handler (every trace would be written twice)
+    with _logger_lock:
+        if _logger is None:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            logger = logging.getLogger('chat_traces')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(os.path.join(TRACE_DIR, TRACE_FILE), maxBytes=TRACE_MAX_BYTES,
+                                          backupCount=TRACE_BACKUPS, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+
+def write_trace(trace):
+    try:
+        _get_logger().info(json.dumps(trace.to_dict(), default=str))
+    except OSError:
+        pass  # tracing must never break a chat turn
+
+
+def read_traces(limit=500):
+    """Most recent traces (newest last), across the current and rotated files."""
+    paths = [os.path.join(TRACE_DIR, TRACE_FILE)]
+    paths += [f"{paths[0]}.{i}" for i in range(1, TRACE_BACKUPS + 1)]
+    traces = []
+    for path in paths:  # newest file first
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            lines = f.readlines()
+        for line in reversed(lines):
+            try:
+                traces.append(json.loads(line))
+            except ValueError:
+                continue
+            if len(traces) >= limit:
+                return traces[::-1]
+    return traces[::-1]
@@ -0,0 +1,72 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, quote
+
+# URL canonicalisation before scraping.
+# Many catalog URLs point at the same page and differ only in tracking
+# parameters (_ga=..., utm_*) or in how they are percent-encoded ("|" vs "%7C").
+# Canonical URLs let us fetch each page once and fan the result out to every
+# course row that references it. Plain anchors (#section) are dropped, but
+# single-page-app routes (#/course/123, #!/course/123) name different pages
+# behind the same shell URL, so they are kept.
+
+TRACKING_PARAMS = {
+    '_ga', '_gl', 'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'yclid',
+}
+TRACKING_PREFIXES = ('utm_',)
+
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+UNRESERVED = set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+# Characters left as-is when re-encoding; everything else (e.g. "|", spaces) is %-encoded
+SAFE_CHARS = "-._~:/?#[]@!$&'()*+,;=%"
+PERCENT_ESCAPE = re.compile(r'%([0-9A-Fa-f]{2})')
+ROUTE_FRAGMENT_PREFIXES = ('/', '!/')
+
+
+def _normalize_escapes(text):
+    """Decode %XX for unreserved characters, upper-case the rest, encode unsafe characters."""
+    def fix(match):
+        char = chr(int(match.group(1), 16))
+        return char if char in UNRESERVED else '%' + match.group(1).upper()
+    return quote(PERCENT_ESCAPE.sub(fix, text), safe=SAFE_CHARS)
+
+
+def _is_tracking(name, tracking_params):
+    name = name.lower()
+    return name in tracking_params or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url, tracking_params=TRACKING_PARAMS):
+    """Canonical form of `url`: lower-case scheme and host, no default port or anchor fragment,
+    consistent percent-encoding and no tracking parameters. Parameter order and
+    route fragments (#/...) are kept."""
+    parts = urlsplit(str(url).strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    netloc = host
+    if parts.port and str(parts.port) != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+
+    path = _normalize_escapes(parts.path) or '/'
+    params = []
+    for pair in parts.query.split('&'):
+        if not pair:
+            continue
+        name = pair.split('=', 1)[0]
+        if _is_tracking(name, tracking_params):
+            continue
+        params.append(_normalize_escapes(pair))
+    fragment = ''
+    if parts.fragment.startswith(ROUTE_FRAGMENT_PREFIXES):
+        fragment = _normalize_escapes(parts.fragment)
+    return urlunsplit((scheme, netloc, path, '&'.join(params), fragment))
+
+
+def group_by_canonical(urls, tracking_params=TRACKING_PARAMS):
+    """Return (canonical url for each input, {canonical url: [input indexes]})."""
+    canonical = [canonicalize_url(u, tracking_params) for u in urls]
+    groups = {}
+    for i, c in enumerate(canonical):
+        groups.setdefault(c, []).append(i)
+    return canonical, groups
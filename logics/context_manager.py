@@ -0,0 +1,76 @@
+from helper_functions import llm
+
+# Builds the chat history part of the prompt under a token budget.
+# The most recent turns are sent verbatim; anything older is folded into a
+# rolling summary that is carried from turn to turn, so prompt size stays flat
+# however long the session runs.
+
+DEFAULT_BUDGET_TOKENS = 1500
+DEFAULT_RECENT_TURNS = 3
+SUMMARY_MAX_TOKENS = 250
+# Rough per-message overhead for role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def message_tokens(message):
+    return llm.count_tokens(message.get('content') or '') + MESSAGE_OVERHEAD_TOKENS
+
+
+def summarize_messages(previous_summary, messages):
+    """Fold `messages` into `previous_summary` with one short LLM call."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    prompt = f"""
+    Update the running summary of a conversation between a user and a course assistant.
+    Keep the user's goals, competencies, proficiency level and any courses already discussed.
+    Use at most 120 words and plain sentences.
+
+    Current summary:
+    {previous_summary or "(none)"}
+
+    New messages:
+    {transcript}
+    """
+    return llm.get_completion(prompt, max_tokens=SUMMARY_MAX_TOKENS).strip()
+
+
+class ConversationContext:
+    """Keep one per chat session (e.g. in st.session_state) so the summary carries over."""
+
+    def __init__(self, budget_tokens=DEFAULT_BUDGET_TOKENS, recent_turns=DEFAULT_RECENT_TURNS):
+        self.budget_tokens = budget_tokens
+        self.recent_turns = recent_turns
+        self.summary = ''
+        self.summarized_upto = 0      # number of history messages already in the summary
+
+    def build(self, chat_history):
+        """Return (messages, report) to place between the system prompt and the new user message.
+
+        `report` has the tokens sent, what the old prompt layout would have used
+        (history pasted into the system prompt and repeated as messages) and the difference.
+        """
+        history = [m for m in chat_history if m.get('role') in ('user', 'assistant')]
+
+        recent = history[-self.recent_turns * 2:] if self.recent_turns else []
+        # Trim the window further if even the recent turns do not fit
+        budget = self.budget_tokens - (llm.count_tokens(self.summary) if self.summary else 0)
+        while recent and sum(message_tokens(m) for m in recent) > budget:
+            recent = recent[1:]
+
+        older_end = len(history) - len(recent)
+        if older_end > self.summarized_upto:
+            self.summary = summarize_messages(self.summary, history[self.summarized_upto:older_end])
+            self.summarized_upto = older_end
+
+        messages = []
+        if self.summary:
+            messages.append({'role': 'system', 'content': f"Summary of the earlier conversation: {self.summary}"})
+        messages.extend({'role': m['role'], 'content': m['content']} for m in recent)
+
+        sent = sum(message_tokens(m) for m in messages)
+        baseline = llm.count_tokens(str(chat_history)) + sum(message_tokens(m) for m in chat_history)
+        report = {
+            'context_tokens': sent,
+            'context_tokens_baseline': baseline,
+            'context_tokens_saved': baseline - sent,
+        }
+        return messages, report
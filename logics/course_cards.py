@@ -0,0 +1,107 @@
+import html
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# HTML for the course cards on "View All Courses".
+# Each card is rendered once per row content and each page once per
+# (filter key, page, page size), then shared by every session, so a rerun
+# sends a single pre-built block instead of thousands of st.markdown elements.
+
+MAX_CACHED_CARDS = 20000
+MAX_CACHED_PAGES = 2000
+
+
+class _LRU:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+_card_cache = _LRU(MAX_CACHED_CARDS)
+_page_cache = _LRU(MAX_CACHED_PAGES)
+
+
+def row_hash(record):
+    payload = json.dumps(record, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _value(record, key):
+    value = str(record.get(key, '') or '').strip()
+    return 'N/A' if value.lower() in ('', 'nan') else html.escape(value)
+
+
+def render_card(record):
+    title = html.escape(str(record.get('Course Title', '')).strip())
+    parts = [
+        "<div class='course-card'>",
+        f"<div class='course-title'>{title}</div>",
+        f"<div class='course-detail'>💡 <strong>Competency:</strong> {_value(record, 'Competency')}</div>",
+        f"<div class='course-detail'>🎯 <strong>Proficiency Level:</strong> {_value(record, 'Proficiency Level')}</div>",
+        f"<div class='course-detail'>🏫 <strong>Provider:</strong> {_value(record, 'Course Provider')}</div>",
+        f"<div class='course-detail'>🖥️ <strong>Mode:</strong> {_value(record, 'Training Mode')}</div>",
+        f"<div class='course-detail'>🗓️ <strong>Training Period:</strong> {_value(record, 'Training Period')}</div>",
+    ]
+    url = str(record.get('URL', '') or '').strip()
+    if url and url.lower() != 'nan':
+        parts.append(
+            f"<div class='course-link'>🔗 <a href='{html.escape(url, quote=True)}' target='_blank'>Course Link</a></div>"
+        )
+    parts.append("</div>")
+    return ''.join(parts)
+
+
+def card_html(record, key=None):
+    """Memoised card for one row; `key` defaults to a hash of the row's content."""
+    key = key or row_hash(record)
+    cached = _card_cache.get(key)
+    if cached is None:
+        cached = render_card(record)
+        _card_cache.put(key, cached)
+    return cached
+
+
+def page_html(records, row_keys, filter_key, cards_per_row=4):
+    """One HTML block for a page of cards, memoised per (filter key, rows on the page)."""
+    page_key = (filter_key, cards_per_row, tuple(row_keys))
+    cached = _page_cache.get(page_key)
+    if cached is None:
+        cards = ''.join(card_html(record, key) for record, key in zip(records, row_keys))
+        cached = (
+            f"<div class='course-grid' style='grid-template-columns: repeat({cards_per_row}, minmax(0, 1fr));'>"
+            f"{cards}</div>"
+        )
+        _page_cache.put(page_key, cached)
+    return cached
+
+
+_row_keys = {}
+_row_keys_lock = threading.Lock()
+
+
+def row_keys_for(catalog):
+    """Row hashes for every catalog row, computed once per catalog version."""
+    with _row_keys_lock:
+        keys = _row_keys.get(catalog.version)
+        if keys is None:
+            keys = [row_hash(record) for record in catalog.records]
+            _row_keys.clear()
+            _row_keys[catalog.version] = keys
+        return keys
@@ -0,0 +1,73 @@
+import os
+import hashlib
+import threading
+import pandas as pd
+
+# Single, process-wide copy of courses.csv.
+# Every Streamlit session and page reads from here instead of parsing the CSV
+# itself. The file is re-read only when its mtime/size changes, and the cached
+# catalog is only replaced when the contents actually differ.
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'courses.csv')
+
+
+class Catalog:
+    def __init__(self, df, version):
+        self.df = df                    # stripped column names, blanks as ''
+        self.version = version          # sha256 of the CSV bytes
+        self.records = df.to_dict('records')
+
+        # Precomputed lookups, built in one pass
+        self.by_title = {}              # course title -> row dict
+        self.titles_by_competency = {}  # competency -> [course titles]
+        self.rows_by_proficiency = {}   # proficiency level -> [row dicts]
+        for record in self.records:
+            title = str(record['Course Title']).strip()
+            competency = str(record['Competency']).strip()
+            self.by_title[title] = record
+            self.titles_by_competency.setdefault(competency, []).append(title)
+            self.rows_by_proficiency.setdefault(str(record['Proficiency Level']).strip(), []).append(record)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def competencies(self):
+        return sorted(c for c in self.titles_by_competency if c)
+
+    @property
+    def proficiency_levels(self):
+        return sorted(p for p in self.rows_by_proficiency if p)
+
+
+def _read_catalog(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    version = hashlib.sha256(raw).hexdigest()
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip()
+    df = df.fillna('')
+    return df, version
+
+
+_lock = threading.Lock()
+_catalog = None
+_stat = None
+load_count = 0
+
+
+def get_catalog(path=CSV_PATH):
+    """Return the shared Catalog, reloading it if courses.csv changed on disk."""
+    global _catalog, _stat, load_count
+    st = os.stat(path)
+    stat = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    if _catalog is not None and stat == _stat:
+        return _catalog
+    with _lock:
+        if _catalog is None or stat != _stat:
+            df, version = _read_catalog(path)
+            if _catalog is None or version != _catalog.version:
+                _catalog = Catalog(df, version)
+                load_count += 1
+            _stat = stat
+    return _catalog
@@ -0,0 +1,215 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from helper_functions import llm
+from helper_functions import json_output
+from logics import course_catalog
+
+# Local vector index over the course catalog.
+# Each row of courses.csv is embedded once (title, competency, learning outcomes)
+# and stored as a float32 matrix on disk, so the chatbot can shortlist courses
+# without pasting the whole catalog into the prompt.
+
+INDEX_DIR = './data/cache/course_index'
+EMBEDDING_MODEL = 'text-embedding-3-small'
+
+
+def row_to_text(row):
+    """Text that gets embedded for one course row."""
+    return (
+        f"Course Title: {str(row.get('Course Title', '')).strip()}\n"
+        f"Competency: {str(row.get('Competency', '')).strip()}\n"
+        f"Learning Outcomes: {str(row.get('Learning Outcomes', '')).strip()}"
+    )
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class CourseIndex:
+    def __init__(self, vectors, meta, model=EMBEDDING_MODEL):
+        self.vectors = vectors      # (n_rows, dim) float32, rows L2-normalised
+        self.meta = meta            # one dict per row: competency, course_name, hash
+        self.model = model
+
+    def __len__(self):
+        return len(self.meta)
+
+    def search_vector(self, query_vector, k=10):
+        """Cosine top-k for an already embedded query. Returns (row, score) pairs."""
+        if len(self.meta) == 0:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = self.vectors @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def search(self, query, k=10):
+        """Embed the query and return the best matching courses, one entry per title."""
+        query_vector = llm.get_embeddings_cached([query], model=self.model)[0]
+        # Over-fetch a little because the same title can appear under several rows
+        hits = self.search_vector(query_vector, k=k * 2)
+        results = []
+        seen = set()
+        for i, score in hits:
+            entry = self.meta[i]
+            if entry['course_name'] in seen:
+                continue
+            seen.add(entry['course_name'])
+            results.append({
+                'competency': entry['competency'],
+                'course_name': entry['course_name'],
+                'score': round(score, 4),
+            })
+            if len(results) == k:
+                break
+        return results
+
+    def save(self, index_dir=INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        vectors_path = os.path.join(index_dir, 'embeddings.npy')
+        meta_path = os.path.join(index_dir, 'meta.json')
+        # Write to temp files first so a crash never leaves a half-written index
+        # (np.save appends .npy to names that do not already end with it)
+        tmp_vectors = vectors_path + '.tmp.npy'
+        tmp_meta = meta_path + '.tmp'
+        np.save(tmp_vectors, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({'model': self.model, 'rows': self.meta}, f)
+        os.replace(tmp_vectors, vectors_path)
+        os.replace(tmp_meta, meta_path)
+
+
+def load_index(index_dir=INDEX_DIR):
+    """Load a saved index with the matrix memory-mapped. Returns None if missing."""
+    vectors_path = os.path.join(index_dir, 'embeddings.npy')
+    meta_path = os.path.join(index_dir, 'meta.json')
+    if not (os.path.exists(vectors_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        saved = json.load(f)
+    vectors = np.load(vectors_path, mmap_mode='r')
+    if vectors.shape[0] != len(saved['rows']):
+        return None
+    return CourseIndex(vectors, saved['rows'], model=saved.get('model', EMBEDDING_MODEL))
+
+
+def build_index(df, index_dir=INDEX_DIR, model=EMBEDDING_MODEL):
+    """Build (or refresh) the index for `df`, embedding only rows whose content changed."""
+    existing = load_index(index_dir)
+    reusable = {}
+    if existing is not None and existing.model == model:
+        for i, entry in enumerate(existing.meta):
+            reusable[entry['hash']] = i
+
+    meta = []
+    texts = []
+    for row in df.to_dict('records'):
+        text = row_to_text(row)
+        meta.append({
+            'competency': str(row['Competency']).strip(),
+            'course_name': str(row['Course Title']).strip(),
+            'hash': content_hash(text),
+        })
+        texts.append(text)
+
+    missing = [i for i, entry in enumerate(meta) if entry['hash'] not in reusable]
+    new_vectors = llm.get_embeddings_cached([texts[i] for i in missing], model=model) if missing else []
+
+    if missing:
+        dim = new_vectors.shape[1]
+    elif reusable:
+        # Reused vectors only come from the same model, so they share the new vectors' width
+        dim = existing.vectors.shape[1]
+    else:
+        dim = 0
+    vectors = np.zeros((len(meta), dim), dtype=np.float32)
+    for i, entry in enumerate(meta):
+        if entry['hash'] in reusable:
+            vectors[i] = existing.vectors[reusable[entry['hash']]]
+    if missing:
+        vectors[missing] = _normalize(np.asarray(new_vectors, dtype=np.float32))
+    changed = bool(missing) or existing is None or len(existing.meta) != len(meta)
+    existing = None  # release the old memory map before the files are replaced
+
+    index = CourseIndex(vectors, meta, model=model)
+    if changed:
+        index.save(index_dir)
+        # Re-open memory-mapped so every process shares the same pages
+        index = load_index(index_dir)
+    return index
+
+
+RERANK_SCHEMA = {
+    "type": "object",
+    "properties": {"selected": {"type": "array", "items": {"type": "integer"}}},
+    "required": ["selected"],
+    "additionalProperties": False,
+}
+
+
+def rerank_candidates(user_message, candidates, max_results=5):
+    """Ask the LLM to keep only the relevant courses out of a short candidate list."""
+    if not candidates:
+        return []
+    delimiter = "####"
+    numbered = "\n".join(
+        f"{i}. {c['course_name']} ({c['competency']})" for i, c in enumerate(candidates, start=1)
+    )
+    prompt = f"""
+    You will be given a customer query enclosed in {delimiter} and a numbered list of candidate courses.
+    Pick at most {max_results} candidates that are relevant to the query, best first.
+    If the query is generic, pick a few representative courses.
+    Respond only with a JSON object of the form {{"selected": [<candidate numbers>]}}.
+
+    Candidates:
+    {numbered}
+
+    Query: {delimiter}{user_message}{delimiter}
+    """
+    answer = json_output.complete_json([{"role": "user", "content": prompt}], 'rerank', RERANK_SCHEMA)
+    if answer is None:
+        return candidates[:max_results]
+    selected = answer['selected']
+    picked = []
+    for n in selected:
+        if isinstance(n, int) and 1 <= n <= len(candidates) and candidates[n - 1] not in picked:
+            picked.append(candidates[n - 1])
+    return picked[:max_results]
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+
+
+def get_course_index(catalog=None):
+    """Process-wide index over the shared catalog, refreshed when the catalog changes."""
+    global _index, _index_version
+    catalog = catalog or course_catalog.get_catalog()
+    if _index is not None and _index_version == catalog.version:
+        return _index
+    # Concurrent sessions on a cold start wait for one build instead of each embedding the catalog
+    with _lock:
+        if _index is None or _index_version != catalog.version:
+            _index = build_index(catalog.df)
+            _index_version = catalog.version
+    return _index
+
+
+if __name__ == "__main__":
+    # Prebuild / refresh the index: python -m logics.course_index
+    index = get_course_index()
+    print(f"Indexed {len(index)} course rows into {INDEX_DIR}")
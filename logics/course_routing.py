@@ -0,0 +1,193 @@
+import re
+import hashlib
+import threading
+from helper_functions import json_output
+from logics import course_catalog
+
+# Two-stage, ID-based course identification.
+# Stage 1 routes the query to competency codes (C01-C14, PS for People Skills)
+# with a prompt that lists only the 15 competency names. Stage 2 shows the model
+# just those competencies' courses, each behind a short stable ID, and asks for
+# IDs back. IDs resolve to catalog rows with one dict lookup, so the model never
+# has to echo a course title exactly.
+
+MAX_COMPETENCIES = 3
+MAX_COURSES = 5
+ID_HASH_CHARS = 3
+# Columns that tell catalog rows apart; a title alone repeats across proficiency levels and providers
+ID_COLUMNS = ('Course Title', 'Proficiency Level', 'URL', 'Course Provider')
+COMPETENCY_CODE = re.compile(r'^\s*(C\d+)\s*:')
+
+
+def competency_code(competency):
+    """"C09: Data Analytics & Visualisation" -> "C09"; names without a code use their initials."""
+    match = COMPETENCY_CODE.match(competency)
+    if match:
+        return match.group(1)
+    return ''.join(word[0] for word in competency.split() if word[:1].isalpha()).upper() or 'X'
+
+
+def _text(value):
+    return '' if value is None or value != value else str(value).strip()  # NaN != NaN
+
+
+class RoutingTable:
+    def __init__(self, catalog):
+        self.version = catalog.version
+        self.competencies = {}      # code -> competency name
+        self.courses_by_code = {}   # code -> [(course id, title, proficiency level)]
+        self.by_id = {}             # course id -> row dict
+        rows_by_code = {}
+        for record in catalog.records:
+            competency = _text(record['Competency'])
+            title = _text(record['Course Title'])
+            if not competency or not title:
+                continue
+            code = competency_code(competency)
+            self.competencies.setdefault(code, competency)
+            rows_by_code.setdefault(code, []).append(record)
+        for code, records in rows_by_code.items():
+            ids = self._course_ids(code, records)
+            for course_id, record in zip(ids, records):
+                if course_id in self.by_id:
+                    continue  # the same course listed again; it is offered once
+                self.by_id[course_id] = record
+                self.courses_by_code.setdefault(code, []).append(
+                    (course_id, _text(record['Course Title']), _text(record['Proficiency Level']))
+                )
+
+    @staticmethod
+    def _course_ids(code, records):
+        """`code`-<hash of the ID_COLUMNS> for each row: stable when rows are added, removed or reordered.
+
+        Rows that agree on every ID column are the same course and share an ID. Each
+        hash is cut to the shortest prefix, from ID_HASH_CHARS up, that no other
+        course in the competency shares, so no ID depends on row order.
+        """
+        digests = [
+            hashlib.sha1('\x1f'.join(_text(record.get(column)) for column in ID_COLUMNS).encode('utf-8')).hexdigest()
+            for record in records
+        ]
+        distinct = set(digests)
+        ids = []
+        for digest in digests:
+            length = ID_HASH_CHARS
+            while any(other != digest and other[:length] == digest[:length] for other in distinct):
+                length += 1
+            ids.append(f"{code}-{digest[:length]}")
+        return ids
+
+    def resolve(self, course_id):
+        """Catalog row for `course_id`, or None."""
+        return self.by_id.get(str(course_id).strip())
+
+
+ROUTE_SCHEMA = {
+    "type": "object",
+    "properties": {"codes": {"type": "array", "items": {"type": "string"}}, "generic": {"type": "boolean"}},
+    "required": ["codes", "generic"],
+    "additionalProperties": False,
+}
+CHOOSE_SCHEMA = {
+    "type": "object",
+    "properties": {"ids": {"type": "array", "items": {"type": "string"}}},
+    "required": ["ids"],
+    "additionalProperties": False,
+}
+
+
+def _ask_json(prompt, name, schema):
+    return json_output.complete_json([{"role": "user", "content": prompt}], name, schema, default={})
+
+
+def route_competencies_prompt(user_message, table):
+    delimiter = "####"
+    competencies = "\n".join(f"{code}: {name.split(':', 1)[-1].strip()}"
+                             for code, name in sorted(table.competencies.items()))
+    return f"""
+    Route the customer query enclosed in {delimiter} to the competencies it is about.
+    Competencies:
+    {competencies}
+
+    Respond only with a JSON object {{"codes": [<up to {MAX_COMPETENCIES} codes, best first>], "generic": <bool>}}.
+    Set "generic" to true if the query asks for recommendations without naming a topic.
+    Use an empty list if nothing matches.
+
+    Query: {delimiter}{user_message}{delimiter}
+    """
+
+
+def choose_courses_prompt(user_message, table, codes):
+    delimiter = "####"
+    lines = []
+    for code in codes:
+        lines.append(f"[{table.competencies[code]}]")
+        lines.extend(f"{course_id} | {title} | {level}" for course_id, title, level in table.courses_by_code[code])
+    courses = "\n".join(lines)
+    return f"""
+    Pick at most {MAX_COURSES} courses relevant to the customer query enclosed in {delimiter}, best first.
+    Courses (id | title | proficiency level):
+    {courses}
+
+    Respond only with a JSON object {{"ids": [<course ids>]}}.
+
+    Query: {delimiter}{user_message}{delimiter}
+    """
+
+
+def route_competencies(user_message, table):
+    """Stage 1: (known competency codes, generic flag)."""
+    answer = _ask_json(route_competencies_prompt(user_message, table), 'competency_route', ROUTE_SCHEMA)
+    codes = answer.get('codes', [])
+    codes = [c for c in dict.fromkeys(str(c).strip().upper() for c in codes) if c in table.competencies]
+    return codes[:MAX_COMPETENCIES], bool(answer.get('generic'))
+
+
+def choose_courses(user_message, table, codes):
+    """Stage 2: the known course IDs the model picked, best first (unknown IDs are dropped)."""
+    answer = _ask_json(choose_courses_prompt(user_message, table, codes), 'course_choice', CHOOSE_SCHEMA)
+    ids = answer.get('ids', [])
+    known = [i for i in dict.fromkeys(str(i).strip() for i in ids) if table.resolve(i) is not None]
+    return known[:MAX_COURSES]
+
+
+def identify_courses_routed(user_message, table=None, report=None):
+    """[{competency, course_name, course_id}] for the query, via the two routing stages.
+
+    `course_id` names the exact catalog row (titles repeat across levels and
+    providers), so get_course_details uses it rather than the title.
+    If `report` is a dict, the stage-1 codes are stored in it under "codes".
+    """
+    table = table or get_routing_table()
+    codes, generic = route_competencies(user_message, table)
+    if report is not None:
+        report['codes'] = codes
+    if codes:
+        course_ids = choose_courses(user_message, table, codes)
+    elif generic:
+        # Same as the full prompt's fallback: a sample course from every competency
+        course_ids = [courses[0][0] for _, courses in sorted(table.courses_by_code.items())]
+    else:
+        course_ids = []
+    matches = []
+    for course_id in course_ids:
+        row = table.resolve(course_id)
+        matches.append({'competency': str(row['Competency']).strip(),
+                        'course_name': str(row['Course Title']).strip(), 'course_id': course_id})
+    return matches
+
+
+_lock = threading.Lock()
+_table = None
+
+
+def get_routing_table(catalog=None):
+    """Process-wide routing table over the shared catalog, rebuilt when the catalog changes."""
+    global _table
+    catalog = catalog or course_catalog.get_catalog()
+    if _table is not None and _table.version == catalog.version:
+        return _table
+    with _lock:
+        if _table is None or _table.version != catalog.version:
+            _table = RoutingTable(catalog)
+    return _table
@@ -0,0 +1,114 @@
+import re
+import math
+import bisect
+import threading
+from logics import course_catalog
+
+# Inverted index for the "View All Courses" search box.
+# Built once per catalog version over title, competency, provider and learning
+# outcomes. Query terms match whole tokens, token prefixes ("aud" -> "audit")
+# and, failing both, any token containing the term (via a trigram index over
+# the vocabulary). All terms must match; results are ranked by field-weighted tf-idf.
+
+FIELD_WEIGHTS = {
+    'Course Title': 3.0,
+    'Competency': 2.0,
+    'Course Provider': 1.5,
+    'Learning Outcomes': 1.0,
+}
+PREFIX_MATCH_FACTOR = 0.8
+SUBSTRING_MATCH_FACTOR = 0.5
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, records):
+        self.size = len(records)
+        self.postings = {}      # token -> {row: weighted term frequency}
+        for row, record in enumerate(records):
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(record.get(field, '')):
+                    row_weights = self.postings.setdefault(token, {})
+                    row_weights[row] = row_weights.get(row, 0.0) + weight
+
+        self.vocabulary = sorted(self.postings)
+        self.idf = {
+            token: math.log(1 + self.size / len(rows)) for token, rows in self.postings.items()
+        }
+        self.trigram_tokens = {}    # trigram -> set of vocabulary tokens containing it
+        for token in self.vocabulary:
+            for gram in trigrams(token):
+                self.trigram_tokens.setdefault(gram, set()).add(token)
+
+    def _expand(self, term):
+        """Vocabulary tokens a query term matches, with a score factor for each."""
+        matches = {}
+        if term in self.postings:
+            matches[term] = 1.0
+        start = bisect.bisect_left(self.vocabulary, term)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            matches.setdefault(token, PREFIX_MATCH_FACTOR)
+        if not matches and len(term) >= 3:
+            grams = trigrams(term)
+            candidates = set.intersection(*(self.trigram_tokens.get(g, set()) for g in grams))
+            for token in candidates:
+                if term in token:
+                    matches[token] = SUBSTRING_MATCH_FACTOR
+        return matches
+
+    def search(self, query, limit=None):
+        """Row positions matching every term of `query`, best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        per_term_scores = []
+        for term in terms:
+            scores = {}
+            for token, factor in self._expand(term).items():
+                idf = self.idf[token]
+                for row, tf in self.postings[token].items():
+                    score = factor * tf * idf
+                    if score > scores.get(row, 0.0):
+                        scores[row] = score
+            if not scores:
+                return []
+            per_term_scores.append(scores)
+
+        # Intersect starting from the rarest term
+        per_term_scores.sort(key=len)
+        rows = set(per_term_scores[0])
+        for scores in per_term_scores[1:]:
+            rows.intersection_update(scores)
+            if not rows:
+                return []
+        ranked = sorted(rows, key=lambda r: (-sum(s[r] for s in per_term_scores), r))
+        return ranked[:limit] if limit else ranked
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+
+
+def get_search_index(catalog=None):
+    """Search index for the current catalog, rebuilt only when the catalog changes."""
+    global _index, _index_version
+    catalog = catalog or course_catalog.get_catalog()
+    if _index is not None and _index_version == catalog.version:
+        return _index
+    with _lock:
+        if _index is None or _index_version != catalog.version:
+            _index = SearchIndex(catalog.records)
+            _index_version = catalog.version
+    return _index
@@ -1,49 +1,89 @@
 import os
-import json
-import openai
-import pandas as pd
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from helper_functions import llm
-
-# Load the CSV file instead of JSON
-csv_path = './data/courses.csv'
-df = pd.read_csv(csv_path)
-df.columns = df.columns.str.strip()
-df = df.fillna('')
+from helper_functions import openai_client
+from helper_functions import tracing
+from helper_functions import json_output
+from helper_functions import semantic_cache
+from helper_functions import moderation
+from logics import course_index
+from logics import course_catalog
+from logics import course_routing
+from logics.context_manager import ConversationContext
+
+# How courses are identified for a query:
+#   "index" - shortlist from the local embedding index, optionally reranked by the LLM
+#   "routed" - two small prompts: competency codes first, then course IDs within them
+#   "full"  - paste the whole competency -> course dictionary into the prompt
+IDENTIFICATION_MODE = os.getenv('IDENTIFICATION_MODE', 'index')
+INDEX_TOP_K = int(os.getenv('INDEX_TOP_K', '10'))
+INDEX_RERANK = os.getenv('INDEX_RERANK', '1') == '1'
+
+# How the reply is generated:
+#   "steps"  - Step 1/2 reasoning, then the answer after the last "####" (only that is shown)
+#   "answer" - only the customer-facing answer, from a compact, de-duplicated course context
+RESPONSE_MODE = os.getenv('RESPONSE_MODE', 'steps')
+
+# Answer paraphrases of earlier first-turn questions from the semantic cache.
+# Later turns depend on the conversation, so they always run the full pipeline.
+SEMANTIC_CACHE = os.getenv('SEMANTIC_CACHE', '1') == '1'
 
 # Function to check if the input text is appropriate
 def check_moderation(text):
-    response = llm.client.moderations.create(input=text)  # assuming llm.client is your OpenAI client
-    result = response.results[0]
+    result = moderation.get_moderator().moderate(text)[0]
     return result.flagged, result.categories
 
-# Build a dictionary: course title -> course details as dict
-dict_of_courses = {
-    row['Course Title'].strip(): row.to_dict()
-    for _, row in df.iterrows()
-}
+# Course data comes from the shared catalog (courses.csv, loaded once per process).
+# It exposes title -> course details (catalog.by_title) and
+# competency -> list of course names (catalog.titles_by_competency).
+
+# Columns that never help answer a question (or repeat another column)
+CONTEXT_SKIP_COLUMNS = {'Categories', 'Course with Hyperlink', 'Prioritisation'}
 
-# Build mapping: Competency -> list of course names
-competency_n_course_name = {}
-for _, row in df.iterrows():
-    competency = row['Competency'].strip()
-    course_name = row['Course Title'].strip()
-    if competency not in competency_n_course_name:
-        competency_n_course_name[competency] = []
-    competency_n_course_name[competency].append(course_name)
 
 def format_course_details(course_list):
-    """Format list of course dicts into a readable string with all columns."""
+    """Compact text block for the prompt: one entry per distinct course, empty fields left out.
+
+    A course listed under several competencies appears once, with the competencies joined.
+    """
+    merged = {}
+    for c in course_list:
+        title = str(c.get('Course Title', '')).strip()
+        if title in merged:
+            competency = str(c.get('Competency', '')).strip()
+            if competency and competency not in merged[title]['Competency']:
+                merged[title]['Competency'] += f"; {competency}"
+            continue
+        merged[title] = {k: str(v).strip() for k, v in c.items()
+                         if k not in CONTEXT_SKIP_COLUMNS and str(v).strip()}
     formatted_courses = []
-    for idx, c in enumerate(course_list, start=1):
+    for idx, c in enumerate(merged.values(), start=1):
         details = [f"Course #{idx}:"]
-        for k, v in c.items():
-            v_str = v if v else "N/A"
-            details.append(f"{k}: {v_str}")
+        details.extend(f"{k}: {v}" for k, v in c.items())
         formatted_courses.append("\n".join(details))
-    return "\n\n---\n\n".join(formatted_courses)
+    return "\n\n".join(formatted_courses)
 
 def identify_competency_and_courses(user_message):
+    if IDENTIFICATION_MODE == 'index':
+        return identify_courses_from_index(user_message)
+    if IDENTIFICATION_MODE == 'routed':
+        return course_routing.identify_courses_routed(user_message)
+    return identify_competency_and_courses_full_prompt(user_message)
+
+
+def identify_courses_from_index(user_message, k=INDEX_TOP_K, rerank=INDEX_RERANK):
+    """Shortlist courses with the embedding index; the LLM only sees the top-k candidates."""
+    candidates = course_index.get_course_index().search(user_message, k=k)
+    if rerank:
+        candidates = course_index.rerank_candidates(user_message, candidates)
+    return [{'competency': c['competency'], 'course_name': c['course_name']} for c in candidates]
+
+
+def full_prompt_messages(user_message):
     delimiter = "####"
+    competency_n_course_name = course_catalog.get_catalog().titles_by_competency
 
     system_message = f"""
     You will be provided with customer queries enclosed in {delimiter}.
@@ -55,36 +95,67 @@ def identify_competency_and_courses(user_message):
     in the Python dictionary below, where each key is a `competency`
     and the value is a list of `course_name`.
 
-    If there are any relevant course(s), output a list of dictionary objects with:
+    If there are any relevant course(s), output a JSON object {{"courses": [...]}}
+    whose list holds one object per course with:
     1) competency
     2) course_name
 
    If the query is generic or does not mention specific competencies,
-   output a JSON list containing one object per competency,
+   put one object per competency in the list,
    each with the competency name and one or two sample course names,
    to provide general recommendations.
 
-   If no courses or competencies match, output an empty list.
-
-    Ensure your response contains only the list of dictionary objects or an empty list, \
-    without any enclosing tags or delimiters.
+   If no courses or competencies match, output {{"courses": []}}.
     """
 
-    messages = [
+    return [
         {'role': 'system', 'content': system_message},
         {'role': 'user', 'content': f"{delimiter}{user_message}{delimiter}"}
     ]
 
-    response_str = llm.get_completion_by_messages(messages)
-    response_str = response_str.replace("'", "\"")
-    return json.loads(response_str)
 
-def get_course_details(list_of_relevant_competency_n_course: list[dict]):
-    course_names_list = [x.get('course_name') for x in list_of_relevant_competency_n_course]
-    return [dict_of_courses.get(name) for name in course_names_list if name in dict_of_courses]
+# Strict schema for the full prompt's reply; titles with apostrophes no longer break parsing
+COURSE_MATCHES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "courses": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"competency": {"type": "string"}, "course_name": {"type": "string"}},
+                "required": ["competency", "course_name"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["courses"],
+    "additionalProperties": False,
+}
+
 
+def identify_competency_and_courses_full_prompt(user_message):
+    matches = json_output.complete_json(full_prompt_messages(user_message), 'course_matches',
+                                        COURSE_MATCHES_SCHEMA, default={'courses': []})
+    return matches['courses']
 
-def generate_response_based_on_course_details(chat_history, user_message, product_details):
+def get_course_details(list_of_relevant_competency_n_course: list[dict]):
+    """Catalog rows for the matches: by course ID where the routed stage gave one, else by title."""
+    catalog = course_catalog.get_catalog()
+    table = None
+    details = []
+    for match in list_of_relevant_competency_n_course:
+        row = None
+        if match.get('course_id'):
+            table = table or course_routing.get_routing_table(catalog)
+            row = table.resolve(match['course_id'])
+        if row is None:
+            row = catalog.by_title.get(match.get('course_name'))
+        if row is not None:
+            details.append(row)
+    return details
+
+
+def build_response_messages(chat_history, user_message, product_details):
     delimiter = "####"
     
     system_message = f"""
@@ -114,9 +185,6 @@ def generate_response_based_on_course_details(chat_history, user_message, produc
 
     Step 3:{delimiter} Answer the customer in a friendly and professional tone. Include pricing, delivery mode, duration, learning outcomes, and start/end dates. Use natural, clear language that aids decision-making.
 
-    The conversation history is:
-    {chat_history}
-
     Use the following format:
     Step 1:{delimiter} <step 1 reasoning>
     Step 2:{delimiter} <step 2 reasoning>
@@ -130,39 +198,310 @@ def generate_response_based_on_course_details(chat_history, user_message, produc
         {'role': 'system', 'content': system_message},
     ]
 
-    # Add prior chat messages as context (convert history dicts to string or similar)
+    # Add prior chat messages as context (already trimmed to budget by ConversationContext)
     for msg in chat_history:
         messages.append({'role': msg['role'], 'content': msg['content']})
 
     # Add current user message
     messages.append({'role': 'user', 'content': f"{delimiter}{user_message}{delimiter}"})
+    return messages
+
+
+def build_answer_messages(chat_history, user_message, product_details):
+    """Messages for RESPONSE_MODE "answer": the course context once, no reasoning steps."""
+    system_message = f"""
+    You are a helpful course assistant. Answer the customer's question using ONLY the course data below.
+    If a detail is missing, say so politely.
+
+    Reply directly to the customer in a friendly and professional tone. Include pricing, delivery mode,
+    duration, learning outcomes and start/end dates where relevant. Use natural, clear language that
+    aids decision-making. Do not describe your reasoning.
+
+    Course data:
+    {format_course_details(product_details)}
+    """
+    messages = [{'role': 'system', 'content': system_message}]
+    # Prior chat (already trimmed to budget by ConversationContext)
+    for msg in chat_history:
+        messages.append({'role': msg['role'], 'content': msg['content']})
+    messages.append({'role': 'user', 'content': user_message})
+    return messages
 
+
+def generate_response_based_on_course_details(chat_history, user_message, product_details, mode=None):
+    delimiter = "####"
+    if (mode or RESPONSE_MODE) == 'answer':
+        return llm.get_completion_by_messages(build_answer_messages(chat_history, user_message, product_details))
+    messages = build_response_messages(chat_history, user_message, product_details)
     response_to_customer = llm.get_completion_by_messages(messages)
     return response_to_customer.split(delimiter)[-1]
 
-def process_user_message(message_history, user_input):
+
+def flagged_input_message(categories):
+    flagged_reasons = ', '.join([k for k, v in dict(categories).items() if v])
+    return f"⚠️ Your input was flagged for: {flagged_reasons}. Please revise your query."
+
+
+FLAGGED_REPLY_MESSAGE = "⚠️ The generated response was flagged as potentially unsafe. Please try rephrasing your query."
+
+# Output moderation runs on paragraphs of the answer while it is still streaming;
+# a paragraph is sent once it has at least this many characters.
+MIN_MODERATION_SEGMENT_CHARS = 400
+
+# Worker threads for blocking stages. Kept outside asyncio.run so a discarded
+# speculative identification does not hold up the end of the turn.
+_stage_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='chat-stage')
+
+
+def process_user_message_sequential(message_history, user_input, context=None):
+    """The original one-stage-after-another flow. Returns (reply, course_details, timings)."""
+    with tracing.start_trace('chat_turn_sequential', query_chars=len(user_input)) as trace:
+        reply, course_details, timings = _run_sequential(message_history, user_input, context)
+        if trace is not None:
+            trace.attrs.update(courses=len(course_details), timings=timings)
+    return reply, course_details, timings
+
+
+def _run_sequential(message_history, user_input, context):
+    timings = {}
+    turn_start = time.perf_counter()
+    context = context or ConversationContext()
 
   # Step 0: Check moderation on user input
+    start = time.perf_counter()
     flagged, categories = check_moderation(user_input)
+    timings['input_moderation'] = time.perf_counter() - start
     if flagged:
-        flagged_reasons = ', '.join([k for k, v in dict(categories).items() if v])
-        warning_msg = f"⚠️ Your input was flagged for: {flagged_reasons}. Please revise your query."
-        return warning_msg, []
-    
+        timings['total'] = time.perf_counter() - turn_start
+        return flagged_input_message(categories), [], timings
+
     # Step 1: Identify courses based on user input (your original logic)
-    competency_n_course_name = identify_competency_and_courses(user_input)
-    print("Matched courses: ", competency_n_course_name)  # For debugging; remove or comment out to avoid double print
+    start = time.perf_counter()
+    with tracing.span('identification'):
+        competency_n_course_name = identify_competency_and_courses(user_input)
+    timings['identification'] = time.perf_counter() - start
 
     # Step 2: Get course details for matched courses
-    course_details = get_course_details(competency_n_course_name)
+    with tracing.span('detail_lookup', matched=len(competency_n_course_name)):
+        course_details = get_course_details(competency_n_course_name)
 
     # Step 3: Generate a detailed, friendly reply using course details and user input
-    reply = generate_response_based_on_course_details(message_history, user_input, course_details)
+    start = time.perf_counter()
+    history_messages, context_report = context.build(message_history)
+    timings['context'] = time.perf_counter() - start
+    timings.update(context_report)
+
+    start = time.perf_counter()
+    reply = generate_response_based_on_course_details(history_messages, user_input, course_details)
+    timings['generation'] = time.perf_counter() - start
 
     # Step 4: Check moderation on the generated reply too (recommended)
+    start = time.perf_counter()
     flagged_resp, categories_resp = check_moderation(reply)
+    timings['output_moderation'] = time.perf_counter() - start
     if flagged_resp:
-        reply = "⚠️ The generated response was flagged as potentially unsafe. Please try rephrasing your query."
+        reply = FLAGGED_REPLY_MESSAGE
+
+    timings['total'] = time.perf_counter() - turn_start
+    return reply, course_details, timings
+
+
+async def _moderate_segment(text):
+    results = await moderation.get_moderator().moderate_async(text)
+    return any(r.flagged for r in results)
+
 
-    # Return the reply and updated conversation history
-    return reply, course_details
\ No newline at end of file
+# The customer-facing part of a reply starts after this marker
+ANSWER_SECTION_PATTERN = r"Step 3:\s*####"
+
+
+async def generate_and_moderate_async(message_history, user_input, course_details, timings,
+                                      on_token=None, turn_start=None, mode=None):
+    """Stream the answer and moderate finished paragraphs of it while generation continues.
+
+    In "steps" mode only text after the last delimiter reaches the user, so segments are
+    restarted whenever a delimiter shows up and only segments inside the final answer count.
+    In "answer" mode the whole reply is the answer.
+    If given, `on_token` is called with each piece of customer-facing text as it arrives.
+    """
+    if (mode or RESPONSE_MODE) == 'answer':
+        delimiter = None
+        messages = build_answer_messages(message_history, user_input, course_details)
+        answer_filter = None
+    else:
+        delimiter = "####"
+        messages = build_response_messages(message_history, user_input, course_details)
+        answer_filter = llm.SectionFilter(ANSWER_SECTION_PATTERN, fallback_delimiter=delimiter)
+    segments = []          # (start, end, task)
+    buffer = ''
+    segment_start = 0
+    turn_start = turn_start or time.perf_counter()
+
+    def show(text):
+        if not text:
+            return
+        if 'first_visible_token' not in timings:
+            timings['first_visible_token'] = time.perf_counter() - turn_start
+        if on_token:
+            on_token(text)
+
+    start = time.perf_counter()
+    with tracing.span('generation') as generation_span:
+        async for delta in llm.stream_completion_by_messages_async(messages):
+            buffer += delta
+            show(answer_filter.feed(delta) if answer_filter else delta)
+            last_delimiter = buffer.rfind(delimiter) if delimiter else -1
+            if last_delimiter != -1 and last_delimiter + len(delimiter) > segment_start:
+                segment_start = last_delimiter + len(delimiter)
+            cut = buffer.rfind('\n\n', segment_start)
+            if cut != -1 and cut - segment_start >= MIN_MODERATION_SEGMENT_CHARS:
+                task = asyncio.create_task(_moderate_segment(buffer[segment_start:cut]))
+                segments.append((segment_start, cut, task))
+                segment_start = cut
+        if answer_filter:
+            show(answer_filter.finish())
+        generation_span.set(answer_chars=len(buffer))
+    timings['generation'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reply_start = buffer.rfind(delimiter) if delimiter else -1
+    reply_start = 0 if reply_start == -1 else reply_start + len(delimiter)
+    reply = buffer[reply_start:]
+
+    # Segments from before the final delimiter belong to the reasoning steps
+    kept = []
+    for seg_start, seg_end, task in segments:
+        if seg_start >= reply_start:
+            kept.append((seg_start, seg_end, task))
+        else:
+            task.cancel()
+
+    # Whatever the streamed segments did not cover is moderated now, in one call
+    uncovered = []
+    covered_from = kept[0][0] if kept else len(buffer)
+    covered_to = kept[-1][1] if kept else len(buffer)
+    if buffer[reply_start:covered_from].strip():
+        uncovered.append(buffer[reply_start:covered_from])
+    if kept and buffer[covered_to:].strip():
+        uncovered.append(buffer[covered_to:])
+    checks = [task for _, _, task in kept]
+    if uncovered:
+        checks.append(asyncio.create_task(_moderate_segment(uncovered)))
+    with tracing.span('output_moderation', segments=len(checks)):
+        flagged = any(await asyncio.gather(*checks)) if checks else False
+    timings['output_moderation_tail'] = time.perf_counter() - start
+    timings['output_moderation_segments'] = len(checks)
+
+    return (FLAGGED_REPLY_MESSAGE if flagged else reply), course_details
+
+
+async def process_user_message_async(message_history, user_input, on_token=None, context=None):
+    """Concurrent pipeline. Returns (reply, course_details, timings).
+
+    Input moderation and course identification start together; identification's
+    result is thrown away if the input turns out to be flagged. `on_token` receives
+    the customer-facing answer incrementally while it streams. Pass the session's
+    ConversationContext as `context` so older turns are summarised rather than resent.
+    """
+    timings = {}
+    turn_start = time.perf_counter()
+    context = context or ConversationContext()
+
+    async with openai_client.async_client_session():
+        with tracing.start_trace('chat_turn', query_chars=len(user_input)) as trace:
+            reply, course_details = await _run_turn(message_history, user_input, context, timings, on_token, turn_start)
+            timings['total'] = time.perf_counter() - turn_start
+            if trace is not None:
+                trace.attrs.update(courses=len(course_details), timings=timings)
+    return reply, course_details, timings
+
+
+def is_first_turn(message_history):
+    return not any(msg['role'] in ('user', 'assistant') for msg in message_history)
+
+
+def _semantic_lookup(user_input):
+    """(query embedding, catalog version, cached entry or None)."""
+    vector = llm.get_embeddings_cached([user_input])[0]
+    version = course_catalog.get_catalog().version
+    hit = semantic_cache.get_cache().get(vector, version)
+    return vector, version, hit
+
+
+async def _run_turn(message_history, user_input, context, timings, on_token, turn_start):
+    """The stages of process_user_message_async. Returns (reply, course_details)."""
+    async def timed(name, coro):
+        start = time.perf_counter()
+        try:
+            with tracing.span(name):
+                return await coro
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    loop = asyncio.get_running_loop()
+    input_moderation_task = asyncio.create_task(
+        timed('input_moderation', moderation.get_moderator().moderate_async(user_input))
+    )
+
+    def start_stages():
+        # identification uses the sync client and local caches, so it runs in a worker thread
+        # (run_in_context keeps its LLM calls attached to this turn's trace)
+        identification = asyncio.create_task(timed('identification', loop.run_in_executor(
+            _stage_executor, tracing.run_in_context(identify_competency_and_courses, user_input)
+        )))
+        # Context assembly may need a summary call, so it also overlaps with moderation and identification
+        context_build = asyncio.create_task(timed('context', loop.run_in_executor(
+            _stage_executor, tracing.run_in_context(context.build, message_history)
+        )))
+        return identification, context_build
+
+    stages = None
+    cache_key = None
+    if SEMANTIC_CACHE and is_first_turn(message_history):
+        if IDENTIFICATION_MODE != 'index':
+            # Identification does not need the query embedding, so a miss should not wait for the
+            # lookup; index identification does, and reuses the (cached) embedding after it instead
+            stages = start_stages()
+        vector, version, hit = await timed('semantic_cache', loop.run_in_executor(
+            _stage_executor, tracing.run_in_context(_semantic_lookup, user_input)
+        ))
+        if hit is not None:
+            for task in stages or ():
+                task.cancel()
+            entry, similarity = hit
+            timings['semantic_cache_similarity'] = similarity
+            result = (await input_moderation_task)[0]
+            if result.flagged:
+                return flagged_input_message(result.categories), []
+            if on_token:
+                on_token(entry['reply'])
+            timings['first_visible_token'] = time.perf_counter() - turn_start
+            return entry['reply'], list(entry['course_details'])
+        cache_key = (vector, version)
+
+    identification, context_build = stages or start_stages()
+
+    result = (await input_moderation_task)[0]
+    if result.flagged:
+        identification.cancel()
+        context_build.cancel()
+        return flagged_input_message(result.categories), []
+
+    competency_n_course_name = await identification
+    with tracing.span('detail_lookup', matched=len(competency_n_course_name)):
+        course_details = get_course_details(competency_n_course_name)
+    history_messages, context_report = await context_build
+    timings.update(context_report)
+
+    reply, course_details = await generate_and_moderate_async(
+        history_messages, user_input, course_details, timings, on_token=on_token, turn_start=turn_start
+    )
+    if cache_key is not None and reply != FLAGGED_REPLY_MESSAGE:
+        vector, version = cache_key
+        semantic_cache.get_cache().put(vector, version, user_input, reply, list(course_details))
+    return reply, course_details
+
+
+def process_user_message(message_history, user_input, on_token=None, context=None):
+    """Returns (reply, course_details, timings) for one chat turn."""
+    return asyncio.run(process_user_message_async(message_history, user_input, on_token=on_token, context=context))
\ No newline at end of file
@@ -1,6 +1,8 @@
+import time
 import streamlit as st
 import pandas as pd
 from logics.customer_query_handler import process_user_message
+from logics.context_manager import ConversationContext
 from helper_functions.utility import check_password 
 
 # Streamlit app config
@@ -14,6 +16,9 @@ if not check_password():
 
 st.title("Your guide to CDP courses for Finance Professionals")
 
+# Re-render the streaming answer at most this often (each render resends the whole answer)
+STREAM_RENDER_SECONDS = 0.05
+
 # Initialize session state
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = [
@@ -23,6 +28,10 @@ if "chat_history" not in st.session_state:
 if "course_details" not in st.session_state:
     st.session_state.course_details = []
 
+# Trims the history sent to the model and keeps a rolling summary of older turns
+if "conversation_context" not in st.session_state:
+    st.session_state.conversation_context = ConversationContext()
+
 # 1. Input form (at the bottom)
 with st.form(key="course_form", clear_on_submit=True):
     user_input = st.text_area("Ask something about our available courses:", height=150)
@@ -30,10 +39,31 @@ with st.form(key="course_form", clear_on_submit=True):
 
 # 2. Process user input BEFORE showing chat history
 if submitted and user_input:
-    reply, course_details = process_user_message(st.session_state.chat_history, user_input)
+    # Render the answer as it streams; it is replaced by the full history below once done
+    stream_box = st.empty()
+    stream = {"text": "", "rendered_at": 0.0}
+
+    def show_token(text):
+        stream["text"] += text
+        now = time.monotonic()
+        if now - stream["rendered_at"] < STREAM_RENDER_SECONDS:
+            return
+        stream["rendered_at"] = now
+        stream_box.markdown(
+            f"<div style='background:#ECECEC;padding:8px;border-radius:8px;margin:5px 0;'>"
+            f"<b>Bot:</b> {stream['text']}</div>",
+            unsafe_allow_html=True
+        )
+
+    reply, course_details, timings = process_user_message(
+        st.session_state.chat_history, user_input, on_token=show_token,
+        context=st.session_state.conversation_context
+    )
+    stream_box.empty()
     st.session_state.chat_history.append({"role": "user", "content": user_input})
     st.session_state.chat_history.append({"role": "assistant", "content": reply})
     st.session_state.course_details = course_details
+    st.session_state.turn_timings = timings
     st.toast("Response generated.")
 
 # 3. Display chat history (above the input form)
@@ -53,6 +83,14 @@ for msg in st.session_state.chat_history:
             unsafe_allow_html=True
         )
 
+if st.session_state.get("turn_timings"):
+    with st.expander("⏱️ Last turn timings"):
+        if "first_visible_token" in st.session_state.turn_timings:
+            st.metric("Time to first visible token",
+                      f"{st.session_state.turn_timings['first_visible_token']:.2f}s")
+        st.json({k: round(v, 3) if isinstance(v, float) else v
+                 for k, v in st.session_state.turn_timings.items()})
+
 # 4. Show matched course details
 st.markdown("---")
 st.subheader("Matched Course Details")
@@ -1,6 +1,7 @@
 import streamlit as st
-import pandas as pd
-import os
+from logics.course_catalog import get_catalog
+from logics.course_search import get_search_index
+from logics.course_cards import page_html, row_keys_for
  
 # --- Page Config ---
 st.set_page_config(
@@ -37,78 +38,69 @@ st.markdown("""
         .course-link {
             font-size: 0.875rem;
         }
+        .course-grid {
+            display: grid;
+            gap: 1rem 1.5rem;
+        }
+        .course-card {
+            padding-bottom: 1rem;
+            border-bottom: 1px solid #e6e6e6;
+        }
     </style>
 """, unsafe_allow_html=True)
  
 # --- Load CSV ---
-current_dir = os.path.dirname(__file__)
-csv_path = os.path.join(current_dir, "..", "data", "courses.csv")
- 
+# Shared, already parsed catalog; only re-read when courses.csv changes
 try:
-    df = pd.read_csv(csv_path)
-    df.columns = df.columns.str.strip()
- 
-    # Rename columns
-    df.rename(columns={
-        "Course Title": "title",
-        "Course Provider": "provider",
-        "Training Mode": "mode",
-        " Cost ": "cost"
-    }, inplace=True)
+    catalog = get_catalog()
+    df = catalog.df
  
     # --- Filters ---
     search_query = st.text_input("🔍 Search for a course by title, category, or keyword:")
  
-    competency_options = df["Competency"].dropna().unique().tolist()
-    competency_options.sort()
+    competency_options = catalog.competencies
     selected_competency = st.selectbox("💡 Filter by Competency:", ["All"] + competency_options)
  
-    proficiency_options = df["Proficiency Level"].dropna().unique().tolist()
-    proficiency_options.sort()
+    proficiency_options = catalog.proficiency_levels
     selected_level = st.selectbox("🎯 Filter by Proficiency Level:", ["All"] + proficiency_options)
  
     # --- Apply Filters ---
     if search_query:
-        query = search_query.lower()
-        df = df[df.apply(lambda row: query in str(row).lower(), axis=1)]
+        # Prebuilt inverted index; rows come back ranked by relevance
+        df = df.iloc[get_search_index(catalog).search(search_query)]
  
     if selected_competency != "All":
-        df = df[df["Competency"] == selected_competency]
+        df = df[df["Competency"].str.strip() == selected_competency]
  
     if selected_level != "All":
-        df = df[df["Proficiency Level"] == selected_level]
+        df = df[df["Proficiency Level"].str.strip() == selected_level]
  
     # --- Results Count ---
     st.markdown(f"### Showing {len(df)} course(s)")
  
+    # --- Pagination ---
+    page_col, size_col = st.columns([3, 1])
+    with size_col:
+        page_size = st.selectbox("Courses per page:", [12, 24, 48, 96], index=1)
+    total_pages = max(1, -(-len(df) // page_size))
+    with page_col:
+        page = st.number_input(f"Page (of {total_pages}):", min_value=1, max_value=total_pages, value=1, step=1)
+
     # --- Display Cards ---
+    # The whole page is one cached HTML block instead of one element per detail line
     cards_per_row = 4
-    rows = [df.iloc[i:i + cards_per_row] for i in range(0, len(df), cards_per_row)]
- 
-    for row in rows:
-        cols = st.columns(cards_per_row)
-        for idx, (_, course) in enumerate(row.iterrows()):
-            with cols[idx]:
-                # Title box
-                st.markdown(f"<div class='course-title'>{course['title']}</div>", unsafe_allow_html=True)
- 
-                # Details with smaller font
-                st.markdown(f"<div class='course-detail'>💡 <strong>Competency:</strong> {course.get('Competency', 'N/A')}</div>", unsafe_allow_html=True)
-                st.markdown(f"<div class='course-detail'>🎯 <strong>Proficiency Level:</strong> {course.get('Proficiency Level', 'N/A')}</div>", unsafe_allow_html=True)
-                st.markdown(f"<div class='course-detail'>🏫 <strong>Provider:</strong> {course.get('provider', 'N/A')}</div>", unsafe_allow_html=True)
-                st.markdown(f"<div class='course-detail'>🖥️ <strong>Mode:</strong> {course.get('mode', 'N/A')}</div>", unsafe_allow_html=True)
- 
-                training_period = course.get("Training Period")
-                training_text = "N/A" if pd.isna(training_period) or str(training_period).strip().lower() == "nan" else training_period
-                st.markdown(f"<div class='course-detail'>🗓️ <strong>Training Period:</strong> {training_text}</div>", unsafe_allow_html=True)
- 
-                url = course.get("URL", "")
-                if pd.notna(url) and str(url).strip().lower() not in ["", "nan"]:
-                    st.markdown(f"<div class='course-link'>🔗 <a href='{url}' target='_blank'>Course Link</a></div>", unsafe_allow_html=True)
- 
-                st.markdown("&nbsp;", unsafe_allow_html=True)
- 
-        st.markdown("----")
+    positions = df.index[(page - 1) * page_size:page * page_size].tolist()
+    all_row_keys = row_keys_for(catalog)
+    filter_key = (search_query, selected_competency, selected_level)
+    st.markdown(
+        page_html(
+            [catalog.records[i] for i in positions],
+            [all_row_keys[i] for i in positions],
+            filter_key,
+            cards_per_row=cards_per_row,
+        ),
+        unsafe_allow_html=True
+    )
  
 except FileNotFoundError:
     st.error("❌ Could not find `courses.csv`. Make sure it's in the `/data` folder.")
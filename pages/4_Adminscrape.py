@@ -1,8 +1,8 @@
-import asyncio
+import time
 import streamlit as st
 import pandas as pd
 import os
-from helper_functions.scraper import scrape_url_data
+from helper_functions import scrape_jobs
 from helper_functions.utility import check_password 
 
 # Enable full-width layout
@@ -20,16 +20,6 @@ if st.session_state.get("role") != "Admin":
 # ✅ Optional: show who is logged in
 st.sidebar.markdown(f"👤 Logged in as: `{st.session_state.get('role', 'Unknown')}`")
 
-# ----------------------
-# Function to scrape CSV
-# ----------------------
-def scrape_from_csv(csv_path, progress_callback=None):
-    df = pd.read_csv(csv_path)
-    urls = df['URL'].dropna().tolist()
-    scraped_data = asyncio.run(scrape_url_data(urls, progress_callback=progress_callback))
-    return pd.DataFrame(scraped_data)
-
-
 # ---------------------
 # Main Admin Scrape UI
 # ---------------------
@@ -47,24 +37,70 @@ def main():
     original_csv = os.path.join(base_dir, 'courses.csv')
     scraped_csv = os.path.join(base_dir, 'courses_with_scraped_info.csv')
 
-    if st.button("Scrape"):
-        progress_bar = st.progress(0)
-        status_text = st.empty()  # Placeholder to show live progress text
-
-        def update_progress(p):
-            progress_bar.progress(p)
-            status_text.text(f"🏃‍♂️ Progress: {int(p * 100)}%")
-
-        with st.spinner("🏃‍♂️ Scraping all course URLs, please wait..."):
-            scraped_df = scrape_from_csv(original_csv, progress_callback=update_progress)
-            scraped_df.to_csv(scraped_csv, index=False)
+    # Links checked recently are reused; stale ones get a conditional request
+    freshness_hours = st.number_input("Re-check links older than (hours):", min_value=0, value=24, step=1)
+    force = st.checkbox("Force a full re-scrape of every URL")
+    # Only used for pages that need a real browser
+    profile = st.selectbox("Browser fetch profile:", ["link-check", "full"],
+                           help="link-check blocks images, fonts and trackers and stops at DOMContentLoaded")
+    workers = st.number_input("Browser worker processes:", min_value=1, max_value=8, value=1, step=1,
+                              help="Above 1, every URL is loaded in a browser, sharded across this many processes "
+                                   "(the freshness and force options then do not apply)")
 
-        st.success("✅ Scraping completed!")
-
-        # Show the scraped data in a wide table
-        st.dataframe(scraped_df, use_container_width=True, height=600)
-    else:
+    if st.button("Scrape"):
+        # Runs in a background worker process; this page only submits and polls
+        job_id = scrape_jobs.submit_job(
+            original_csv, scraped_csv,
+            freshness_seconds=freshness_hours * 3600, force=force, profile=profile, workers=int(workers)
+        )
+        st.session_state["scrape_job_id"] = job_id
+
+    jobs = scrape_jobs.list_jobs(limit=10)
+    if not jobs:
         st.info("Click the 'Scrape' button to start scraping all course URLs from courses.csv.")
+        return
+
+    job_ids = [job["id"] for job in jobs]
+    selected_id = st.session_state.get("scrape_job_id", job_ids[0])
+    if selected_id not in job_ids:
+        selected_id = job_ids[0]
+    selected_id = st.selectbox(
+        "Scrape job:", job_ids, index=job_ids.index(selected_id),
+        format_func=lambda i: next(f"#{j['id']} – {j['status']}" for j in jobs if j["id"] == i)
+    )
+    st.session_state["scrape_job_id"] = selected_id
+    job = scrape_jobs.get_job(selected_id)
+
+    st.progress(job["progress"])
+    st.text(f"🏃‍♂️ Job #{job['id']} {job['status']}: {job['done']} / {job['total'] or '?'} URLs")
+
+    col_cancel, col_resume = st.columns(2)
+    with col_cancel:
+        if job["status"] in ("queued", "running") and st.button("Cancel job"):
+            scrape_jobs.cancel_job(job["id"])
+            st.rerun()
+    with col_resume:
+        if job["status"] in ("cancelled", "failed") and st.button("Resume job"):
+            if scrape_jobs.resume_job(job["id"]):
+                st.rerun()
+            st.error("The input CSV has changed since this job started; start a new scrape instead.")
+
+    if job["status"] == "completed":
+        st.success("✅ Scraping completed!")
+        if job["summary"]:
+            st.caption(" · ".join(f"{k}: {v}" for k, v in job["summary"].items()))
+    elif job["status"] == "failed":
+        st.error(f"❌ Scrape job failed: {job['error']}")
+
+    # Show the scraped data in a wide table (partial results while the job runs)
+    results = scrape_jobs.read_results(job["id"])
+    if results:
+        st.dataframe(pd.DataFrame(results), use_container_width=True, height=600)
+
+    # Poll while the job is still active
+    if job["status"] in scrape_jobs.ACTIVE_STATUSES:
+        time.sleep(2)
+        st.rerun()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+import streamlit as st
+import pandas as pd
+from helper_functions import tracing
+from helper_functions import openai_client
+from helper_functions import json_output
+from helper_functions import semantic_cache
+from helper_functions import moderation
+from helper_functions.utility import check_password
+
+# Enable full-width layout
+st.set_page_config(layout="wide")
+
+# ✅ Require login
+if not check_password():
+    st.stop()
+
+# ✅ Allow only admin
+if st.session_state.get("role") != "Admin":
+    st.error("🚫 Access denied: This page is for admin users only.")
+    st.stop()
+
+st.sidebar.markdown(f"👤 Logged in as: `{st.session_state.get('role', 'Unknown')}`")
+
+HISTOGRAM_BINS = 20
+
+
+def stage_frame(traces):
+    """One row per (turn, span) with its duration."""
+    rows = []
+    for trace in traces:
+        rows.append({"trace_id": trace["trace_id"], "stage": "total", "duration_ms": trace["duration_ms"]})
+        for span in trace["spans"]:
+            rows.append({"trace_id": trace["trace_id"], "stage": span["name"], "duration_ms": span["duration_ms"]})
+    return pd.DataFrame(rows)
+
+
+def histogram(values, bins=HISTOGRAM_BINS):
+    counts = pd.cut(values, bins=min(bins, max(1, values.nunique()))).value_counts(sort=False)
+    counts.index = [f"{interval.right:.0f}" for interval in counts.index]
+    return counts.rename("turns")
+
+
+# ---------------------
+# Main Metrics UI
+# ---------------------
+def main():
+    st.title("Admin: Chatbot Metrics")
+
+    st.markdown("""
+    **Purpose:**
+    Per-stage latency, token usage and estimated cost of recent chat turns,
+    read from the local trace file (`data/cache/traces`).
+    """)
+
+    if not tracing.TRACING_ENABLED:
+        st.warning("Tracing is disabled (LLM_TRACING=0); only previously written traces are shown.")
+
+    limit = st.slider("Turns to analyse:", min_value=10, max_value=2000, value=200, step=10)
+    traces = [t for t in tracing.read_traces(limit) if t["name"] == "chat_turn"]
+    if not traces:
+        st.info("No traced chat turns yet.")
+        return
+
+    stages = stage_frame(traces)
+    totals = stages[stages["stage"] == "total"]["duration_ms"]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Turns", len(traces))
+    col2.metric("p50 / p95 turn", f"{totals.quantile(0.5) / 1000:.2f}s / {totals.quantile(0.95) / 1000:.2f}s")
+    col3.metric("Tokens per turn", f"{sum(t['prompt_tokens'] + t['completion_tokens'] for t in traces) / len(traces):.0f}")
+    col4.metric("Est. cost", f"${sum(t['cost_usd'] for t in traces):.4f}")
+
+    # Latency percentiles and histogram per stage
+    st.subheader("Stage latency (ms)")
+    summary = stages.groupby("stage")["duration_ms"].describe(percentiles=[0.5, 0.95, 0.99])
+    st.dataframe(summary[["count", "50%", "95%", "99%", "max"]].round(1), use_container_width=True)
+    stage = st.selectbox("Histogram for stage:", sorted(stages["stage"].unique()),
+                         index=sorted(stages["stage"].unique()).index("total"))
+    st.bar_chart(histogram(stages[stages["stage"] == stage]["duration_ms"]))
+
+    # Slowest recent turns, with their stage breakdown
+    st.subheader("Slowest recent turns")
+    slowest = sorted(traces, key=lambda t: t["duration_ms"], reverse=True)[:10]
+    st.dataframe(pd.DataFrame([{
+        "time": pd.to_datetime(t["started_at"], unit="s"),
+        "total_ms": t["duration_ms"],
+        **{s["name"]: s["duration_ms"] for s in t["spans"]},
+        "tokens": t["prompt_tokens"] + t["completion_tokens"],
+        "cost_usd": t["cost_usd"],
+        "trace_id": t["trace_id"],
+    } for t in slowest]), use_container_width=True)
+
+    # Tokens and cost by call type
+    st.subheader("LLM calls")
+    calls = pd.DataFrame([call for t in traces for call in t["llm_calls"]])
+    if not calls.empty:
+        st.dataframe(calls.groupby(["kind", "model"]).agg(
+            calls=("kind", "size"), cached=("cached", "sum"),
+            prompt_tokens=("prompt_tokens", "sum"), completion_tokens=("completion_tokens", "sum"),
+            cost_usd=("cost_usd", "sum"), p95_ms=("duration_ms", lambda d: d.quantile(0.95)),
+        ).round(4), use_container_width=True)
+
+    st.subheader("API client (this server process)")
+    st.json(openai_client.stats.snapshot())
+    st.subheader("Structured JSON replies (this server process)")
+    st.json(json_output.stats.snapshot())
+    st.subheader("Semantic answer cache (this server process)")
+    st.json(semantic_cache.get_cache().stats())
+    st.subheader("Moderation cache and batching (this server process)")
+    st.json(moderation.get_moderator().stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os
+
+# llm reads the key at import; without one it falls back to Streamlit secrets
+os.environ.setdefault('OPENAI_API_KEY', 'test')
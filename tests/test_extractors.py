@@ -0,0 +1,25 @@
+from helper_functions.extractors import parse_cost, parse_date, parse_duration
+
+
+def test_parse_date_formats():
+    assert parse_date('2025-01-12') == '2025-01-12'
+    assert parse_date('12/01/2025') == '2025-01-12'
+    assert parse_date('Starts 12 Jan 2025') == '2025-01-12'
+    assert parse_date('3 March, 2025') == '2025-03-03'
+
+
+def test_parse_date_dash_separated():
+    assert parse_date('12-Jan-2025') == '2025-01-12'
+    assert parse_date('3-March-2025') == '2025-03-03'
+
+
+def test_parse_date_not_available():
+    assert parse_date('TBA') is None
+    assert parse_date('no date here') is None
+
+
+def test_parse_cost_and_duration():
+    assert parse_cost('S$1,200.50') == 1200.5
+    assert parse_cost('NIL') is None
+    assert parse_duration('7HRS') == {'hours': 7.0}
+    assert parse_duration('2 days') == {'days': 2.0}
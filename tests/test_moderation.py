@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from helper_functions import moderation
+
+
+class SlowModerationAPI:
+    """Stands in for llm.get_moderation_response; blocks until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        self.release.wait(5)
+        return SimpleNamespace(model='test-moderation',
+                               results=[SimpleNamespace(flagged='bad' in t) for t in texts])
+
+
+def test_cancelled_caller_does_not_stop_the_batcher(monkeypatch):
+    api = SlowModerationAPI()
+    monkeypatch.setattr(moderation.llm, 'get_moderation_response', api)
+    moderator = moderation.Moderator(batcher=moderation.ModerationBatcher(window_seconds=0.001))
+
+    async def cancel_in_flight():
+        task = asyncio.create_task(moderator.moderate_async('reasoning segment'))
+        while not api.calls:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        api.release.set()
+
+    asyncio.run(cancel_in_flight())
+    result = asyncio.run(asyncio.wait_for(moderator.moderate_async('a bad reply'), timeout=5))
+    assert result[0].flagged
+    assert moderator.batcher._thread.is_alive()
+
+
+def test_cancelled_before_the_batch_is_sent(monkeypatch):
+    api = SlowModerationAPI()
+    api.release.set()
+    monkeypatch.setattr(moderation.llm, 'get_moderation_response', api)
+    batcher = moderation.ModerationBatcher(window_seconds=0.05)
+    moderator = moderation.Moderator(batcher=batcher)
+
+    async def cancel_queued():
+        task = asyncio.create_task(moderator.moderate_async('dropped'))
+        await asyncio.sleep(0)
+        task.cancel()
+        return await moderator.moderate_async('kept')
+
+    assert not asyncio.run(cancel_queued())[0].flagged
+    assert all('dropped' not in call for call in api.calls)
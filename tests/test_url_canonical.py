@@ -0,0 +1,12 @@
+from helper_functions.url_canonical import canonicalize_url
+
+
+def test_tracking_params_and_anchor_dropped():
+    assert canonicalize_url('HTTPS://Example.org:443/a?utm_source=x&id=1#section') == 'https://example.org/a?id=1'
+
+
+def test_route_fragments_kept():
+    a = canonicalize_url('https://www.learn.gov.sg/learner/index.html#/course/309236?app=dlp')
+    b = canonicalize_url('https://www.learn.gov.sg/learner/index.html#/course/309237?app=dlp')
+    assert a == 'https://www.learn.gov.sg/learner/index.html#/course/309236?app=dlp'
+    assert a != b